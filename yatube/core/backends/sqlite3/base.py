@@ -0,0 +1,22 @@
+"""
+SQLite с транзакциями BEGIN IMMEDIATE для писателей.
+
+Стандартный бэкенд Django 2.2 открывает транзакцию отложенным BEGIN:
+блокировка записи берется только на первом INSERT/UPDATE. В режиме WAL
+такая транзакция, успевшая что-то прочитать, при коммите другого
+писателя получает «database is locked» сразу, без busy_timeout.
+Транзакции из core.sqlite.immediate() открываются BEGIN IMMEDIATE и
+берут блокировку записи в начале, так что писатели честно ждут друг
+друга. Прочие atomic() (например, админка оборачивает в него и GET)
+остаются отложенными и не встают в очередь писателей.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    # Включается core.sqlite.immediate() на время своего atomic()
+    begin_immediate = False
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(
+            'BEGIN IMMEDIATE' if self.begin_immediate else 'BEGIN')
@@ -0,0 +1,159 @@
+"""
+Бенчмарк основных страниц: задержка и число SQL-запросов.
+
+seed() наполняет базу объемами, близкими к боевым, run() гоняет
+страницы через тестовый клиент Django и собирает перцентили
+задержки и число запросов, compare() сравнивает результат с
+сохраненным в JSON эталоном.
+"""
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, modify_settings
+from django.urls import reverse
+
+from core import seeding
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Адрес не из INTERNAL_IPS: debug_toolbar не должен попадать в замеры
+CLIENT_ADDR = '203.0.113.1'
+DEEP_PAGE = 50
+
+
+def seed(users=10000, groups=50, posts=1000000, comments=200000,
+         follows=100000, random_seed=0, batch_size=5000,
+         prefix=seeding.PREFIX, log=print):
+    """Наполняет базу данными бенчмарка (см. core.seeding)."""
+    seeding.generate(
+        users=users, groups=groups, posts=posts, comments=comments,
+        follows=follows, random_seed=random_seed, chunk_size=batch_size,
+        prefix=prefix, log=log)
+
+
+def scenarios(prefix=seeding.PREFIX):
+    """
+    Страницы для замеров: (имя, url, пользователь или None) по данным
+    seed с тем же префиксом.
+    """
+    users = User.objects.filter(username__startswith=f'{prefix}_')
+    posts = Post.objects.filter(author__username__startswith=f'{prefix}_')
+    author = users.order_by('-counters__posts_count').first()
+    reader = users.order_by('-counters__following_count').first()
+    group = (Group.objects.filter(slug__startswith=f'{prefix}-')
+             .order_by('-posts_count').first())
+    post = posts.order_by('-comments_count').first()
+    if not (author and reader and group and post):
+        raise ValueError(f'Нет данных бенчмарка с префиксом {prefix}, '
+                         'запустите с --seed')
+    index = reverse('posts:index')
+    return [
+        ('index', index, None),
+        ('index_deep', f'{index}?page={DEEP_PAGE}', None),
+        ('group_list', reverse('posts:group_list', args=[group.slug]), None),
+        ('profile', reverse('posts:profile', args=[author.username]), None),
+        ('post_detail', reverse('posts:post_detail', args=[post.pk]), None),
+        ('follow_index', reverse('posts:follow_index'), reader),
+    ]
+
+
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу."""
+    values = sorted(values)
+    rank = max(0, -(-len(values) * percent // 100) - 1)
+    return values[int(rank)]
+
+
+class QueryCounter:
+    """
+    Считает SQL-запросы через execute_wrapper. connection.queries
+    не годится: сигнал request_started очищает его посреди замера.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def measure(client, url, requests=30, cold=False):
+    """Замеры одной страницы; первый запрос прогревочный."""
+    latencies, queries, errors = [], [], 0
+    for number in range(requests + 1):
+        if cold:
+            cache.clear()
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            started = time.perf_counter()
+            try:
+                status = client.get(url).status_code
+            except Exception:
+                status = 500
+            elapsed = (time.perf_counter() - started) * 1000
+        if not number:
+            continue
+        latencies.append(elapsed)
+        queries.append(counter.count)
+        errors += status >= 400
+    return {
+        'url': url,
+        'p50': round(percentile(latencies, 50), 3),
+        'p95': round(percentile(latencies, 95), 3),
+        'p99': round(percentile(latencies, 99), 3),
+        'mean': round(statistics.mean(latencies), 3),
+        'queries': max(queries),
+        'errors': errors,
+    }
+
+
+def run(requests=30, cold=False, prefix=seeding.PREFIX):
+    """Замеры всех страниц из scenarios()."""
+    views = {}
+    # Хост тестового клиента вне тестов не разрешен
+    with modify_settings(ALLOWED_HOSTS={'append': 'testserver'}):
+        for name, url, user in scenarios(prefix):
+            client = Client(REMOTE_ADDR=CLIENT_ADDR)
+            if user is not None:
+                client.force_login(user)
+            views[name] = measure(client, url, requests, cold)
+    return {
+        'meta': {
+            'requests': requests,
+            'cold': cold,
+            'rows': {
+                model.__name__: model.objects.count()
+                for model in (User, Group, Post, Comment, Follow)
+            },
+        },
+        'views': views,
+    }
+
+
+def compare(current, baseline, threshold=0.25, min_delta=5.0):
+    """
+    Регрессии относительно эталона: p95 выросла больше чем на
+    threshold (и больше чем на min_delta мс), запросов или
+    ошибок стало больше. Возвращает список описаний.
+    """
+    regressions = []
+    for name, base in baseline['views'].items():
+        result = current['views'].get(name)
+        if result is None:
+            continue
+        limit = max(base['p95'] * (1 + threshold), base['p95'] + min_delta)
+        if result['p95'] > limit:
+            regressions.append(
+                f'{name}: p95 {result["p95"]} мс > {limit:.3f} мс')
+        if result['queries'] > base['queries']:
+            regressions.append(
+                f'{name}: запросов {result["queries"]} > {base["queries"]}')
+        if result['errors'] > base['errors']:
+            regressions.append(
+                f'{name}: ошибок {result["errors"]} > {base["errors"]}')
+    return regressions
@@ -0,0 +1,283 @@
+"""
+Бэкенды кэша с учетом попаданий для метрик.
+
+TwoTierCache - двухуровневый кэш: небольшой LRU в памяти процесса
+(L1) перед общим для всех воркеров файловым кэшем (L2). Запись
+идет в L2, а ключ дописывается в общий журнал инвалидаций; перед
+чтением процесс дочитывает журнал и выбрасывает из L1 ключи,
+измененные другими процессами. Внешние сервисы не нужны.
+"""
+import os
+import pickle
+import random
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache.backends import locmem
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+
+from . import metrics
+
+MISSING = object()
+CLEAR_ALL = '*'
+
+
+class LocMemCache(locmem.LocMemCache):
+    """
+    LocMemCache, учитывающий попадания и промахи для метрик.
+    get_many и get_or_set здесь идут через get.
+    """
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, MISSING, version)
+        hit = value is not MISSING
+        metrics.record_cache(int(hit), int(not hit))
+        return value if hit else default
+
+
+class FileCache(FileBasedCache):
+    """
+    Файловый кэш, который не обходит весь каталог на каждой записи:
+    FileBasedCache проверяет MAX_ENTRIES через glob при каждом set.
+    """
+    cull_every = 100
+
+    def _cull(self):
+        if not random.randrange(self.cull_every):
+            super()._cull()
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        """
+        Атомарно и между процессами (на этом держатся блокировки
+        core.stampede): файл появляется через os.link, который не
+        перезаписывает существующий. Истекший файл удаляет has_key.
+        """
+        if self.has_key(key, version):
+            return False
+        self._createdir()
+        fd, tmp_path = tempfile.mkstemp(dir=self._dir)
+        try:
+            with open(fd, 'wb') as file:
+                self._write_content(file, timeout, value)
+            os.link(tmp_path, self._key_to_file(key, version))
+        except FileExistsError:
+            return False
+        finally:
+            os.remove(tmp_path)
+        return True
+
+
+class TwoTierCache(BaseCache):
+    """
+    OPTIONS:
+    L1_MAX_ENTRIES - размер LRU в памяти процесса (1000);
+    L1_TIMEOUT - сколько секунд значение живет в L1 (30): дольше
+    этого копия в L1 не переживет истечения в L2;
+    JOURNAL_MAX_SIZE - размер журнала, после которого он
+    начинается заново, а все L1 очищаются (1 МБ);
+    MAX_ENTRIES, CULL_FREQUENCY - как у файлового кэша (L2).
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._l1_max_entries = int(options.get('L1_MAX_ENTRIES', 1000))
+        self._l1_timeout = float(options.get('L1_TIMEOUT', 30))
+        self._journal_max_size = int(
+            options.get('JOURNAL_MAX_SIZE', 1024 * 1024))
+        self._shared = FileCache(location, params)
+        self._journal = os.path.join(self._shared._dir, 'invalidations.log')
+        self._l1 = OrderedDict()
+        self._lock = threading.RLock()
+        self._journal_id = None
+        self._journal_offset = 0
+
+    # L1
+
+    def _l1_get(self, key):
+        with self._lock:
+            entry = self._l1.get(key)
+            if entry is None:
+                return MISSING
+            expires, data = entry
+            if expires < time.monotonic():
+                del self._l1[key]
+                return MISSING
+            self._l1.move_to_end(key)
+        return pickle.loads(data)
+
+    def _l1_set(self, key, value, timeout):
+        timeout = self._timeout(timeout)
+        ttl = self._l1_timeout if timeout is None else min(
+            timeout, self._l1_timeout)
+        if ttl <= 0:
+            self._l1_discard(key)
+            return
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._l1[key] = (time.monotonic() + ttl, data)
+            self._l1.move_to_end(key)
+            while len(self._l1) > self._l1_max_entries:
+                self._l1.popitem(last=False)
+
+    def _l1_discard(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._l1.pop(key, None)
+
+    def _timeout(self, timeout):
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+    # Журнал инвалидаций
+
+    def _publish(self, *keys):
+        """Сообщает другим процессам, что ключи изменились."""
+        pid = os.getpid()
+        lines = ''.join(f'{pid} {key}\n' for key in keys).encode()
+        try:
+            if os.path.getsize(self._journal) > self._journal_max_size:
+                # Читатели увидят новый файл и очистят L1 целиком
+                os.replace(self._journal, self._journal + '.old')
+        except FileNotFoundError:
+            pass
+        # O_APPEND: строки разных процессов не перемешиваются
+        fd = os.open(self._journal, os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+                     0o644)
+        try:
+            os.write(fd, lines)
+        finally:
+            os.close(fd)
+
+    def _sync(self):
+        """Выбрасывает из L1 ключи, измененные другими процессами."""
+        try:
+            stat = os.stat(self._journal)
+        except FileNotFoundError:
+            return
+        journal_id = (stat.st_dev, stat.st_ino)
+        with self._lock:
+            if (journal_id != self._journal_id
+                    or stat.st_size < self._journal_offset):
+                # Журнал начат заново: пропущенное уже не восстановить
+                self._l1.clear()
+                self._journal_id = journal_id
+                self._journal_offset = stat.st_size
+                return
+            if stat.st_size == self._journal_offset:
+                return
+            with open(self._journal, 'rb') as journal:
+                journal.seek(self._journal_offset)
+                data = journal.read(stat.st_size - self._journal_offset)
+            # Недописанную строку дочитаем в следующий раз
+            data = data[:data.rfind(b'\n') + 1]
+            self._journal_offset += len(data)
+            pid = str(os.getpid())
+            for line in data.decode(errors='replace').splitlines():
+                writer, _, key = line.partition(' ')
+                if writer == pid:
+                    continue
+                if key == CLEAR_ALL:
+                    self._l1.clear()
+                else:
+                    self._l1.pop(key, None)
+
+    # API кэша
+
+    def get(self, key, default=None, version=None):
+        made_key = self.make_key(key, version)
+        self.validate_key(made_key)
+        self._sync()
+        value = self._l1_get(made_key)
+        if value is MISSING:
+            value = self._shared.get(key, MISSING, version)
+            if value is not MISSING:
+                self._l1_set(made_key, value, self._l1_timeout)
+        hit = value is not MISSING
+        metrics.record_cache(int(hit), int(not hit))
+        return value if hit else default
+
+    def get_many(self, keys, version=None):
+        self._sync()
+        found, missed = {}, []
+        for key in keys:
+            made_key = self.make_key(key, version)
+            self.validate_key(made_key)
+            value = self._l1_get(made_key)
+            if value is MISSING:
+                missed.append(key)
+            else:
+                found[key] = value
+        for key in missed:
+            value = self._shared.get(key, MISSING, version)
+            if value is not MISSING:
+                found[key] = value
+                self._l1_set(
+                    self.make_key(key, version), value, self._l1_timeout)
+        metrics.record_cache(len(found), len(keys) - len(found))
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        made_key = self.make_key(key, version)
+        self.validate_key(made_key)
+        self._shared.set(key, value, timeout, version)
+        self._publish(made_key)
+        self._l1_set(made_key, value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        made_keys = []
+        for key, value in data.items():
+            made_key = self.make_key(key, version)
+            self.validate_key(made_key)
+            self._shared.set(key, value, timeout, version)
+            made_keys.append(made_key)
+        if made_keys:
+            self._publish(*made_keys)
+        for key, value in data.items():
+            self._l1_set(self.make_key(key, version), value, timeout)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        made_key = self.make_key(key, version)
+        self.validate_key(made_key)
+        if not self._shared.add(key, value, timeout, version):
+            return False
+        self._publish(made_key)
+        self._l1_set(made_key, value, timeout)
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._shared.touch(key, timeout, version)
+
+    def has_key(self, key, version=None):
+        return self.get(key, MISSING, version) is not MISSING
+
+    def delete(self, key, version=None):
+        made_key = self.make_key(key, version)
+        self.validate_key(made_key)
+        self._shared.delete(key, version)
+        self._publish(made_key)
+        self._l1_discard(made_key)
+
+    def delete_many(self, keys, version=None):
+        made_keys = [self.make_key(key, version) for key in keys]
+        for key in keys:
+            self._shared.delete(key, version)
+        if made_keys:
+            self._publish(*made_keys)
+        self._l1_discard(*made_keys)
+
+    def incr(self, key, delta=1, version=None):
+        value = self._shared.incr(key, delta, version)
+        made_key = self.make_key(key, version)
+        self._publish(made_key)
+        self._l1_discard(made_key)
+        return value
+
+    def clear(self):
+        self._shared.clear()
+        self._publish(CLEAR_ALL)
+        with self._lock:
+            self._l1.clear()
@@ -0,0 +1,407 @@
+"""
+Нагрузочный тест: смесь чтений и записей в несколько потоков.
+
+Бенчмарк (core.benchmark) меряет страницы по одной и не видит
+конкуренции, например блокировок записи SQLite, когда post_create,
+add_comment и profile_follow идут на фоне чтений. Здесь виртуальные
+читатели гоняют WSGI-приложение проекта по взвешенной смеси
+страниц: напрямую в процессе (transport='wsgi') или через локальный
+сокет (transport='http'; без url поднимается свой сервер).
+
+Потоки делят один процесс и GIL; processes > 1 запускает их копии
+в дочерних процессах, и у каждого свое соединение с БД, как у
+воркеров gunicorn. Блокировки распознаются по OperationalError
+внутри приложения (core.sqlite.is_locked), поэтому у стороннего
+сервера (url) они видны только как ответы 500.
+"""
+import http.client
+import multiprocessing
+import random
+import re
+import statistics
+import sys
+import threading
+import time
+from http.cookies import SimpleCookie
+from io import BytesIO
+from urllib.parse import unquote_to_bytes, urlencode, urlsplit
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.servers.basehttp import (ThreadedWSGIServer,
+                                          WSGIRequestHandler,
+                                          get_internal_wsgi_application)
+from django.core.signals import got_request_exception
+from django.db import connection, connections
+from django.test import Client
+from django.urls import reverse
+
+from posts.models import Group, Post, UserCounters
+
+from .benchmark import CLIENT_ADDR, percentile
+from .sqlite import is_locked
+
+User = get_user_model()
+
+DEFAULT_MIX = {
+    'index': 30, 'group_list': 10, 'profile': 10, 'post_detail': 20,
+    'follow_index': 10, 'search': 5, 'post_create': 5, 'add_comment': 6,
+    'profile_follow': 2, 'profile_unfollow': 2,
+}
+WRITES = {'post_create', 'add_comment', 'profile_follow',
+          'profile_unfollow'}
+# Страницы только для вошедших: аноним получил бы редирект на вход
+PRIVATE = WRITES | {'follow_index'}
+
+ERRORS_KEY = 'loadtest.errors'
+LOCK_HEADER = 'X-Loadtest-Lock'
+CSRF_FIELD = re.compile(rb'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+
+def _note_exception(sender, request=None, **kwargs):
+    errors = request.META.get(ERRORS_KEY) if request is not None else None
+    if errors is not None:
+        errors.append(sys.exc_info()[1])
+
+
+def instrument(app):
+    """
+    Обертка приложения: ответ, при котором случилась блокировка
+    SQLite, получает заголовок LOCK_HEADER.
+    """
+    def wrapped(environ, start_response):
+        errors = environ[ERRORS_KEY] = []
+        # Адрес не из INTERNAL_IPS, как в бенчмарке
+        environ['REMOTE_ADDR'] = CLIENT_ADDR
+
+        def start(status, headers, exc_info=None):
+            if any(map(is_locked, errors)):
+                headers = [*headers, (LOCK_HEADER, '1')]
+            return start_response(status, headers, exc_info)
+
+        return app(environ, start)
+    return wrapped
+
+
+class WSGITransport:
+    """Вызывает WSGI-приложение прямо в процессе."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def request(self, method, path, body=b'', headers=()):
+        path, _, query = path.partition('?')
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': unquote_to_bytes(path).decode('iso-8859-1'),
+            'QUERY_STRING': query,
+            'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': 'localhost',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        for name, value in headers:
+            key = name.upper().replace('-', '_')
+            environ[key if key == 'CONTENT_TYPE' else f'HTTP_{key}'] = value
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split()[0])
+            response['headers'] = headers
+
+        result = self.app(environ, start_response)
+        try:
+            content = b''.join(result)
+        finally:
+            # close() шлет request_finished: соединение с БД закрывается
+            if hasattr(result, 'close'):
+                result.close()
+        return response['status'], response['headers'], content
+
+
+class HTTPTransport:
+    """Ходит на сервер по HTTP, новое соединение на запрос."""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+
+    def request(self, method, path, body=b'', headers=()):
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        try:
+            conn.request(method, path, body, dict(headers))
+            response = conn.getresponse()
+            return response.status, response.getheaders(), response.read()
+        finally:
+            conn.close()
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(app):
+    """Поднимает многопоточный сервер на свободном порту."""
+    server = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler)
+    server.set_app(app)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+class VirtualUser:
+    """Cookie одного читателя."""
+
+    def __init__(self, session_key):
+        self.cookies = {settings.SESSION_COOKIE_NAME: session_key}
+        self.csrf_token = ''
+
+    def headers(self):
+        cookie = '; '.join(f'{k}={v}' for k, v in self.cookies.items())
+        return [('Cookie', cookie)]
+
+    def remember(self, headers):
+        for name, value in headers:
+            if name.lower() == 'set-cookie':
+                for morsel in SimpleCookie(value).values():
+                    self.cookies[morsel.key] = morsel.value
+
+    def log_in(self, transport):
+        """Берет CSRF-токен для форм со страницы создания поста."""
+        _, headers, content = transport.request(
+            'GET', reverse('posts:post_create'), headers=self.headers())
+        self.remember(headers)
+        match = CSRF_FIELD.search(content)
+        self.csrf_token = match[1].decode() if match else ''
+
+
+def targets(users, sample=200):
+    """Посты, авторы, группы и сессии читателей для нагрузки."""
+    posts = list(Post.objects.order_by('-pk').values_list(
+        'pk', 'text')[:sample])
+    readers = list(User.objects.filter(
+        is_active=True).order_by('?')[:users])
+    if not posts or not readers:
+        raise ValueError('Нет данных, наполните базу командой seed')
+    authors = list(UserCounters.objects.filter(
+        posts_count__gt=0).order_by('-posts_count').values_list(
+        'user__username', flat=True)[:sample])
+    sessions = []
+    for reader in readers:
+        client = Client()
+        client.force_login(reader)
+        sessions.append(client.cookies[settings.SESSION_COOKIE_NAME].value)
+    words = {word for _, text in posts for word in re.findall(r'\w{4,}', text)}
+    return {
+        'posts': [pk for pk, _ in posts],
+        'authors': authors or [readers[0].username],
+        'groups': list(Group.objects.values_list('slug', flat=True)[:sample]),
+        'words': sorted(words)[:500] or ['нагрузка'],
+        'sessions': sessions,
+    }
+
+
+def _text(rng, data, size):
+    return ' '.join(rng.choice(data['words']) for _ in range(size))
+
+
+def request_for(name, rng, data):
+    """Метод, путь и поля формы (для POST) страницы name."""
+    if name == 'index':
+        return 'GET', f'{reverse("posts:index")}?page={rng.randint(1, 5)}'
+    if name == 'group_list' and data['groups']:
+        return 'GET', reverse(
+            'posts:group_list', args=[rng.choice(data['groups'])])
+    if name == 'search':
+        query = urlencode({'q': rng.choice(data['words'])})
+        return 'GET', f'{reverse("posts:search")}?{query}'
+    if name == 'post_detail':
+        return 'GET', reverse(
+            'posts:post_detail', args=[rng.choice(data['posts'])])
+    if name == 'add_comment':
+        return 'POST', reverse(
+            'posts:add_comment', args=[rng.choice(data['posts'])]), {
+            'text': _text(rng, data, 5)}
+    if name == 'post_create':
+        return 'POST', reverse('posts:post_create'), {
+            'text': _text(rng, data, 20)}
+    if name in ('profile', 'profile_follow', 'profile_unfollow'):
+        return 'GET', reverse(
+            f'posts:{name}', args=[rng.choice(data['authors'])])
+    if name == 'follow_index':
+        return 'GET', reverse('posts:follow_index')
+    return 'GET', reverse('posts:index')
+
+
+def _empty_stats(mix):
+    return {name: {'latencies': [], 'errors': 0, 'locks': 0}
+            for name in mix}
+
+
+def _virtual_user(config, number, stats):
+    """Один читатель шлет запросы, пока не выйдет время или лимит."""
+    transport = config['transport']
+    sessions = config['data']['sessions']
+    rng = random.Random(f'{config["seed"]}:{number}')
+    user = VirtualUser(sessions[number % len(sessions)])
+    names, weights = zip(*config['mix'].items())
+    try:
+        user.log_in(transport)
+        deadline = time.perf_counter() + config['duration']
+        sent = 0
+        while (sent < config['requests'] if config['requests']
+               else time.perf_counter() < deadline):
+            name = rng.choices(names, weights)[0]
+            method, path, *form = request_for(name, rng, config['data'])
+            anonymous = (name not in PRIVATE
+                         and rng.random() < config['anonymous'])
+            headers = [] if anonymous else user.headers()
+            body = b''
+            if form:
+                body = urlencode({
+                    **form[0], 'csrfmiddlewaretoken': user.csrf_token,
+                }).encode()
+                headers.append(
+                    ('Content-Type', 'application/x-www-form-urlencoded'))
+            started = time.perf_counter()
+            try:
+                status, response_headers, _ = transport.request(
+                    method, path, body, headers)
+            except Exception:
+                status, response_headers = 599, []
+            elapsed = (time.perf_counter() - started) * 1000
+            sent += 1
+            if not anonymous:
+                user.remember(response_headers)
+            record = stats[name]
+            record['latencies'].append(elapsed)
+            record['errors'] += status >= 500
+            record['locks'] += any(
+                header == LOCK_HEADER for header, _ in response_headers)
+    finally:
+        # У каждого потока свое соединение с БД
+        connection.close()
+
+
+def _merge(target, source):
+    for name, record in source.items():
+        total = target.setdefault(
+            name, {'latencies': [], 'errors': 0, 'locks': 0})
+        total['latencies'].extend(record['latencies'])
+        total['errors'] += record['errors']
+        total['locks'] += record['locks']
+    return target
+
+
+def _run_threads(config, first):
+    """Потоки одного процесса; возвращает их общую статистику."""
+    stats = [_empty_stats(config['mix']) for _ in range(config['threads'])]
+    threads = [
+        threading.Thread(target=_virtual_user,
+                         args=(config, first + number, stats[number]))
+        for number in range(config['threads'])]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total = {}
+    for part in stats:
+        _merge(total, part)
+    return total
+
+
+# Настройки прогона для дочерних процессов: они получают их через
+# fork, ведь приложение и транспорт не сериализуются
+_config = {}
+
+
+def _process(first):
+    return _run_threads(_config, first)
+
+
+def summary(record, elapsed):
+    latencies = record['latencies']
+    count = len(latencies)
+    if not count:
+        return {'requests': 0, 'rps': 0.0, 'errors': 0, 'locks': 0}
+    return {
+        'requests': count,
+        'rps': round(count / elapsed, 2),
+        'p50': round(percentile(latencies, 50), 3),
+        'p95': round(percentile(latencies, 95), 3),
+        'p99': round(percentile(latencies, 99), 3),
+        'mean': round(statistics.mean(latencies), 3),
+        'errors': record['errors'],
+        'error_rate': round(record['errors'] / count, 4),
+        'locks': record['locks'],
+        'lock_rate': round(record['locks'] / count, 4),
+    }
+
+
+def run(duration=10.0, requests=None, threads=4, processes=1, mix=None,
+        transport='wsgi', url=None, anonymous=0.5, random_seed=0):
+    """
+    Гоняет смесь mix (страница -> вес) duration секунд или по
+    requests запросов на поток; anonymous - доля чтений без сессии.
+    Возвращает пропускную способность и перцентили по страницам.
+    """
+    mix = dict(mix or DEFAULT_MIX)
+    unknown = set(mix) - set(DEFAULT_MIX)
+    if unknown or not any(mix.values()):
+        raise ValueError(f'Неизвестные страницы: {", ".join(unknown)}')
+    app = instrument(get_internal_wsgi_application())
+    config = {
+        'data': targets(threads * processes), 'mix': mix,
+        'duration': duration, 'requests': requests, 'threads': threads,
+        'anonymous': anonymous, 'seed': random_seed,
+    }
+    server = None
+    if transport == 'http':
+        if url is None:
+            server, url = serve(app)
+        config['transport'] = HTTPTransport(url)
+    else:
+        config['transport'] = WSGITransport(app)
+    got_request_exception.connect(_note_exception)
+    started = time.perf_counter()
+    try:
+        if processes > 1:
+            # Дочерние процессы откроют свои соединения с БД
+            connections.close_all()
+            _config.update(config)
+            with multiprocessing.get_context('fork').Pool(processes) as pool:
+                parts = pool.map(_process, [
+                    number * threads for number in range(processes)])
+            stats = {}
+            for part in parts:
+                _merge(stats, part)
+        else:
+            stats = _run_threads(config, 0)
+    finally:
+        elapsed = time.perf_counter() - started
+        _config.clear()
+        got_request_exception.disconnect(_note_exception)
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+    total = _empty_stats(['total'])
+    for record in stats.values():
+        _merge(total, {'total': record})
+    return {
+        'meta': {
+            'duration': round(elapsed, 3), 'threads': threads,
+            'processes': processes, 'transport': transport,
+            'requests': requests, 'mix': mix, 'anonymous': anonymous,
+        },
+        'total': summary(total['total'], elapsed),
+        'views': {name: summary(record, elapsed)
+                  for name, record in stats.items() if record['latencies']},
+    }
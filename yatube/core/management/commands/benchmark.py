@@ -0,0 +1,90 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import benchmark, seeding
+
+
+class Command(BaseCommand):
+    help = ('Замеряет задержку и число SQL-запросов основных страниц '
+            'и сравнивает их с эталоном')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed', action='store_true',
+            help='сначала наполнить базу тестовыми данными',
+        )
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument('--comments', type=int, default=200000)
+        parser.add_argument('--follows', type=int, default=100000)
+        parser.add_argument(
+            '--random-seed', type=int, default=0,
+            help='зерно генератора: одинаковое зерно - одинаковые данные',
+        )
+        parser.add_argument(
+            '--prefix', default=seeding.PREFIX,
+            help='префикс данных, как у команды seed',
+        )
+        parser.add_argument(
+            '--requests', type=int, default=30,
+            help='сколько запросов на каждую страницу',
+        )
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='очищать кэш перед каждым запросом',
+        )
+        parser.add_argument(
+            '--output', help='куда записать результат в JSON',
+        )
+        parser.add_argument(
+            '--compare', metavar='BASELINE',
+            help='JSON-эталон; при регрессии команда завершится ошибкой',
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=0.25,
+            help='допустимый рост p95 в долях (0.25 - на 25%%)',
+        )
+        parser.add_argument(
+            '--min-delta', type=float, default=5.0,
+            help='рост p95 меньше стольких мс регрессией не считается',
+        )
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            try:
+                benchmark.seed(
+                    users=options['users'],
+                    groups=options['groups'],
+                    posts=options['posts'],
+                    comments=options['comments'],
+                    follows=options['follows'],
+                    random_seed=options['random_seed'],
+                    prefix=options['prefix'],
+                    log=self.stdout.write,
+                )
+            except ValueError as error:
+                raise CommandError(error)
+        try:
+            result = benchmark.run(
+                options['requests'], options['cold'], options['prefix'])
+        except ValueError as error:
+            raise CommandError(error)
+        for name, view in result['views'].items():
+            self.stdout.write(
+                f'{name:<14} p50 {view["p50"]:>9.2f} мс  '
+                f'p95 {view["p95"]:>9.2f} мс  p99 {view["p99"]:>9.2f} мс  '
+                f'запросов {view["queries"]:>3}  ошибок {view["errors"]}')
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(result, output, indent=2, ensure_ascii=False)
+        if options['compare']:
+            with open(options['compare']) as baseline:
+                regressions = benchmark.compare(
+                    result, json.load(baseline),
+                    options['threshold'], options['min_delta'])
+            if regressions:
+                raise CommandError(
+                    'Регрессия производительности:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('Регрессий нет'))
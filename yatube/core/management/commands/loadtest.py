@@ -0,0 +1,89 @@
+import argparse
+import json
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import loadtest
+
+
+def weights(value):
+    """Смесь страниц: index=30,post_create=5,..."""
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        try:
+            mix[name.strip()] = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f'не вес: {item}')
+    return mix
+
+
+class Command(BaseCommand):
+    help = ('Нагружает WSGI-приложение смесью чтений и записей и '
+            'показывает пропускную способность, перцентили, долю '
+            'ошибок и блокировок')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--duration', type=float, default=10.0, help='секунд')
+        parser.add_argument(
+            '--requests', type=int,
+            help='запросов на поток вместо --duration',
+        )
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument(
+            '--processes', type=int, default=1,
+            help='процессов, в каждом --threads потоков',
+        )
+        parser.add_argument(
+            '--mix', type=weights,
+            help='веса страниц, например index=30,post_create=5; '
+                 f'страницы: {", ".join(loadtest.DEFAULT_MIX)}',
+        )
+        parser.add_argument(
+            '--transport', choices=('wsgi', 'http'), default='wsgi',
+            help='wsgi - вызов приложения в процессе, http - через сокет',
+        )
+        parser.add_argument(
+            '--url', help='адрес запущенного сервера для --transport http')
+        parser.add_argument(
+            '--anonymous', type=float, default=0.5,
+            help='доля чтений без сессии',
+        )
+        parser.add_argument('--random-seed', type=int, default=0)
+        parser.add_argument('--output', help='куда записать результат в JSON')
+
+    def handle(self, *args, **options):
+        # Трассировки ответов 500 (блокировок) нужны только с -v 2
+        request_logger = logging.getLogger('django.request')
+        request_logger.disabled = options['verbosity'] < 2
+        try:
+            result = loadtest.run(
+                duration=options['duration'],
+                requests=options['requests'],
+                threads=options['threads'],
+                processes=options['processes'],
+                mix=options['mix'],
+                transport=options['transport'],
+                url=options['url'],
+                anonymous=options['anonymous'],
+                random_seed=options['random_seed'],
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        finally:
+            request_logger.disabled = False
+        rows = [*result['views'].items(), ('total', result['total'])]
+        for name, view in rows:
+            if not view['requests']:
+                continue
+            self.stdout.write(
+                f'{name:<16} {view["requests"]:>7} запр. '
+                f'{view["rps"]:>8.1f} rps  p50 {view["p50"]:>8.2f} мс  '
+                f'p95 {view["p95"]:>8.2f} мс  p99 {view["p99"]:>8.2f} мс  '
+                f'ошибок {view["error_rate"]:>6.2%}  '
+                f'блокировок {view["lock_rate"]:>6.2%}')
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(result, output, indent=2, ensure_ascii=False)
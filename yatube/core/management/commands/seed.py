@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import seeding
+
+
+class Command(BaseCommand):
+    help = ('Наполняет базу синтетическими пользователями, группами, '
+            'постами, комментариями и подписками для нагрузочных тестов')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000)
+        parser.add_argument('--groups', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument('--comments', type=int, default=500000)
+        parser.add_argument('--follows', type=int, default=500000)
+        parser.add_argument(
+            '--random-seed', type=int, default=0,
+            help='зерно генератора: одинаковое зерно - одинаковые данные',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='процессов, которые готовят строки для записи',
+        )
+        parser.add_argument('--chunk-size', type=int, default=10000)
+        parser.add_argument(
+            '--exponent', type=float, default=1.1,
+            help='показатель степенного закона активности авторов',
+        )
+        parser.add_argument(
+            '--prefix', default=seeding.PREFIX,
+            help='префикс имен пользователей и slug групп',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            seeding.generate(
+                users=options['users'],
+                groups=options['groups'],
+                posts=options['posts'],
+                comments=options['comments'],
+                follows=options['follows'],
+                random_seed=options['random_seed'],
+                workers=options['workers'],
+                chunk_size=options['chunk_size'],
+                exponent=options['exponent'],
+                prefix=options['prefix'],
+                log=self.stdout.write,
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS('База наполнена'))
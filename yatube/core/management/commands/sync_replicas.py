@@ -0,0 +1,32 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import replicas
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную базу SQLite в реплики для чтения; '
+            'с --interval повторяет копирование, изображая репликацию')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='секунд между копиями; 0 - скопировать один раз',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.REPLICAS:
+            raise CommandError('Реплики не настроены: YATUBE_REPLICAS=0')
+        while True:
+            for alias in settings.REPLICAS:
+                started = time.monotonic()
+                replicas.sync(alias)
+                if options['verbosity'] > 1:
+                    self.stdout.write(
+                        f'{alias}: {time.monotonic() - started:.2f} с')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS('Реплики обновлены'))
@@ -0,0 +1,187 @@
+"""
+Легкие метрики запросов: SQL, шаблоны, кэш.
+
+Статистика текущего запроса живет в contextvar и заполняется
+execute_wrapper'ом БД (он же ищет N+1), бэкендом шаблонов и
+бэкендом кэша. Итоги
+складываются в гистограммы по имени view, которые отдаются в
+текстовом формате Prometheus.
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextvars import ContextVar
+
+from . import querycheck
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0)
+QUERIES_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+_current = ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    """Счетчики одного запроса."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        # execute_wrapper для соединений с БД
+        querycheck.check(self.shapes, sql)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+    @property
+    def total_time(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self):
+        """Значение заголовка Server-Timing."""
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'cache;desc="hit {self.cache_hits} miss {self.cache_misses}"',
+            f'total;dur={self.total_time * 1000:.1f}',
+        ])
+
+
+def start():
+    stats = RequestStats()
+    return stats, _current.set(stats)
+
+
+def finish(token):
+    _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+def record_cache(hits, misses):
+    """Учитывает обращения к кэшу в статистике текущего запроса."""
+    stats = _current.get()
+    if stats is not None:
+        stats.cache_hits += hits
+        stats.cache_misses += misses
+
+
+class timed_render:
+    """
+    Засекает рендер шаблона. Вложенные шаблоны (include, карточки)
+    входят во время внешнего и отдельно не суммируются.
+    """
+
+    def __enter__(self):
+        self.stats = _current.get()
+        if self.stats is not None:
+            self.stats.template_depth += 1
+            self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        if self.stats is not None:
+            self.stats.template_depth -= 1
+            if not self.stats.template_depth:
+                self.stats.template_time += (
+                    time.perf_counter() - self.started)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Registry:
+    """Гистограммы и счетчики с метками view."""
+
+    HISTOGRAMS = {
+        'yatube_request_duration_seconds': (
+            'Время обработки запроса', SECONDS_BUCKETS),
+        'yatube_db_duration_seconds': (
+            'Время SQL-запросов за запрос', SECONDS_BUCKETS),
+        'yatube_db_queries': (
+            'Число SQL-запросов за запрос', QUERIES_BUCKETS),
+        'yatube_template_duration_seconds': (
+            'Время рендера шаблонов за запрос', SECONDS_BUCKETS),
+    }
+    CACHE_COUNTER = 'yatube_cache_requests_total'
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.histograms = {name: {} for name in self.HISTOGRAMS}
+        self.cache = {}
+
+    def observe(self, view, stats):
+        values = {
+            'yatube_request_duration_seconds': stats.total_time,
+            'yatube_db_duration_seconds': stats.db_time,
+            'yatube_db_queries': stats.queries,
+            'yatube_template_duration_seconds': stats.template_time,
+        }
+        with self.lock:
+            for name, value in values.items():
+                series = self.histograms[name]
+                if view not in series:
+                    series[view] = Histogram(self.HISTOGRAMS[name][1])
+                series[view].observe(value)
+            for result, count in (('hit', stats.cache_hits),
+                                  ('miss', stats.cache_misses)):
+                key = (view, result)
+                self.cache[key] = self.cache.get(key, 0) + count
+
+    def render(self):
+        """Текстовый формат Prometheus (version 0.0.4)."""
+        lines = []
+        with self.lock:
+            for name, (description, _) in self.HISTOGRAMS.items():
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} histogram')
+                for view, histogram in sorted(self.histograms[name].items()):
+                    cumulative = 0
+                    bounds = [*histogram.buckets, '+Inf']
+                    for bound, count in zip(bounds, histogram.counts):
+                        cumulative += count
+                        lines.append(
+                            f'{name}_bucket{{view="{view}",le="{bound}"}} '
+                            f'{cumulative}')
+                    lines.append(
+                        f'{name}_sum{{view="{view}"}} {histogram.sum}')
+                    lines.append(
+                        f'{name}_count{{view="{view}"}} {cumulative}')
+            lines.append(f'# HELP {self.CACHE_COUNTER} Обращения к кэшу')
+            lines.append(f'# TYPE {self.CACHE_COUNTER} counter')
+            for (view, result), count in sorted(self.cache.items()):
+                lines.append(
+                    f'{self.CACHE_COUNTER}{{view="{view}",result="{result}"}}'
+                    f' {count}')
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        with self.lock:
+            self._reset()
+
+
+registry = Registry()
@@ -0,0 +1,88 @@
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from . import metrics, pagecache
+
+
+class MetricsMiddleware:
+    """
+    Собирает SQL, время шаблонов и обращения к кэшу за запрос,
+    складывает их в гистограммы по имени view и отдает итог
+    в заголовке Server-Timing.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats, token = metrics.start()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats))
+                response = self.get_response(request)
+        finally:
+            metrics.finish(token)
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else getattr(
+            request, 'metrics_view', 'unresolved')
+        metrics.registry.observe(view, stats)
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = stats.server_timing()
+        return response
+
+
+class PageCacheMiddleware:
+    """
+    Отдает анонимам сохраненные страницы (core.pagecache) и сохраняет
+    ответы, помеченные суррогатными ключами. Стоит сразу за метриками:
+    попадание не доходит до сессий, разбора URL и шаблонов.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not pagecache.is_anonymous(request):
+            return self.get_response(request)
+        response = pagecache.get(request)
+        if response is not None:
+            request.metrics_view = 'page_cache'
+            return get_conditional_response(
+                request,
+                etag=response.get('ETag'),
+                last_modified=parse_http_date_safe(
+                    response.get('Last-Modified')),
+                response=response,
+            )
+        response = self.get_response(request)
+        pagecache.store(request, response)
+        return response
+
+
+class PageShellMiddleware:
+    """
+    Отдает вошедшим читателям страницы из кэша для гостей, заполняя
+    их дыры (core.pagecache.personalize). Стоит после сессий, CSRF и
+    аутентификации, но до разбора URL и view.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.method != 'GET':
+            return self.get_response(request)
+        response = pagecache.get(request)
+        if response is None:
+            return self.get_response(request)
+        request.metrics_view = 'page_shell'
+        if not request.user.is_authenticated:
+            return response
+        response = pagecache.personalize(request, response)
+        return get_conditional_response(
+            request, etag=response['ETag'], response=response)
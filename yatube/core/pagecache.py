@@ -0,0 +1,120 @@
+"""
+Кэш целых страниц: для гостей и, с дырами, для вошедших читателей.
+
+View помечает ответ суррогатными ключами (тегами) через tag(). Ответ
+хранится вместе с метками своих тегов; purge(tag) выдает тегу новую
+метку, и все страницы с этим тегом перестают находиться - так же,
+как поколения в posts.caching. Анонимом считается запрос без cookie
+сессии: попадание отдается до разбора URL, сессий и шаблонов.
+
+Персональные части страницы отмечены тегом {% hole %}. Вошедшему
+читателю отдается та же страница, а в дыры подставляются его
+фрагменты (PAGE_CACHE_HOLES) - рендерится только они. ETag такой
+страницы собирается из меток ее тегов и поколения читателя
+(PAGE_CACHE_VIEWER).
+"""
+import hashlib
+import re
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control, quote_etag
+from django.utils.module_loading import import_string
+
+PAGE_KEY = 'page:{}'
+TAG_KEY = 'surrogate:{}'
+HOLE = re.compile(r'<!--hole:([\w:]+)-->.*?<!--/hole-->', re.S)
+
+
+def _token():
+    return str(time.time_ns())
+
+
+def tag(response, *tags):
+    """Помечает ответ тегами; без тегов ответ в кэш не попадает."""
+    response.surrogate_keys = getattr(response, 'surrogate_keys', set())
+    response.surrogate_keys.update(tags)
+    # Тот же список для CDN (заголовок в стиле Fastly)
+    response['Surrogate-Key'] = ' '.join(sorted(response.surrogate_keys))
+    return response
+
+
+def purge(*tags):
+    """Сбрасывает все страницы с любым из тегов."""
+    if tags:
+        cache.set_many({TAG_KEY.format(name): _token() for name in tags},
+                       None)
+
+
+def is_anonymous(request):
+    return (request.method in ('GET', 'HEAD')
+            and settings.SESSION_COOKIE_NAME not in request.COOKIES)
+
+
+def _page_key(request):
+    url = f'{request.get_host()}{request.get_full_path()}'
+    return PAGE_KEY.format(hashlib.md5(url.encode()).hexdigest())
+
+
+def get(request):
+    """Сохраненный ответ или None, если его нет или тег сброшен."""
+    entry = cache.get(_page_key(request))
+    if entry is None:
+        return None
+    keys = {TAG_KEY.format(name): token
+            for name, token in entry['tags'].items()}
+    if cache.get_many(list(keys)) != keys:
+        return None
+    response = HttpResponse(entry['content'])
+    for header, value in entry['headers']:
+        response[header] = value
+    response.page_tokens = entry['tags']
+    return response
+
+
+def store(request, response):
+    tags = getattr(response, 'surrogate_keys', None)
+    if (not tags or request.method != 'GET'
+            or response.status_code != 200 or response.streaming
+            or response.cookies):
+        return
+    keys = [TAG_KEY.format(name) for name in tags]
+    tokens = cache.get_many(keys)
+    missing = {key: _token() for key in keys if key not in tokens}
+    if missing:
+        cache.set_many(missing, None)
+        tokens.update(missing)
+    cache.set(_page_key(request), {
+        'content': response.content,
+        'headers': list(response.items()),
+        'tags': {name: tokens[TAG_KEY.format(name)] for name in tags},
+    }, settings.PAGE_CACHE_TIMEOUT)
+
+
+def personalize(request, response):
+    """Заполняет дыры сохраненной страницы фрагментами читателя."""
+    content = response.content.decode(response.charset)
+    holes = list(dict.fromkeys(HOLE.findall(content)))
+    if holes:
+        fragments = import_string(settings.PAGE_CACHE_HOLES)(request, holes)
+        content = HOLE.sub(
+            lambda match: (f'<!--hole:{match[1]}-->'
+                           f'{fragments.get(match[1], "")}<!--/hole-->'),
+            content)
+    response.content = content
+    # Длина сохранена вместе со страницей гостя, а дыры ее изменили
+    response['Content-Length'] = len(response.content)
+    # Дыры меняются с поколением читателя, остальное - с метками тегов
+    marker = ':'.join([
+        response.get('ETag', ''),
+        *(token for _, token in sorted(response.page_tokens.items())),
+        import_string(settings.PAGE_CACHE_VIEWER)(request.user),
+    ])
+    # Валидаторы и Surrogate-Key относятся к странице гостя
+    for header in ('ETag', 'Last-Modified', 'Surrogate-Key'):
+        del response[header]
+    response['ETag'] = quote_etag(hashlib.md5(marker.encode()).hexdigest())
+    patch_cache_control(response, private=True)
+    return response
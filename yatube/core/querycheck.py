@@ -0,0 +1,40 @@
+"""
+Поиск N+1: одинаковые по форме SQL-запросы, повторенные в одном
+запросе к сайту больше QUERY_REPEAT_LIMIT раз.
+
+Форма запроса - SQL без чисел и с раскрытыми списками IN (...),
+поэтому Comment по id=1, id=2, ... дают одну форму. В зависимости
+от QUERY_REPEAT_RAISE повтор пишется в лог или поднимает
+RepeatedQueries прямо в цикле, который его порождает.
+"""
+import logging
+import re
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_NUMBER = re.compile(r'\b\d+\b')
+
+
+class RepeatedQueries(Exception):
+    pass
+
+
+def fingerprint(sql):
+    """Форма SQL-запроса без конкретных значений."""
+    return _NUMBER.sub('N', _IN_LIST.sub('IN (...)', sql))
+
+
+def check(shapes, sql):
+    """Учитывает запрос; сообщает о форме, перешедшей предел."""
+    shape = fingerprint(sql)
+    shapes[shape] += 1
+    if shapes[shape] != settings.QUERY_REPEAT_LIMIT + 1:
+        return
+    message = (f'Больше {settings.QUERY_REPEAT_LIMIT} одинаковых '
+               f'запросов (N+1): {shape}')
+    if settings.QUERY_REPEAT_RAISE:
+        raise RepeatedQueries(message)
+    logger.warning(message)
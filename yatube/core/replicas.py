@@ -0,0 +1,117 @@
+"""
+Чтение лент и страниц постов с реплик, запись - в основную базу.
+
+Реплики - копии основной базы SQLite (REPLICAS в settings), которые
+обновляет manage.py sync_replicas. View, помеченная replica_reads(),
+на время своего выполнения выбирает реплику, и ReplicaRouter
+направляет на нее чтения моделей из REPLICA_APPS. Все остальное,
+включая сессии и пользователей, читается из основной базы: иначе
+только что вошедший читатель на отставшей реплике стал бы гостем.
+
+Реплика отстает, поэтому:
+- после записи сессия на REPLICA_PIN_SECONDS закрепляется за основной
+  базой (pin()), и автор сразу видит свой пост;
+- реплика берется, только если ее копия снята позже последнего
+  изменения страницы (метки поколений posts.caching): иначе кэши
+  страниц и фрагментов заполнились бы устаревшими данными под новой
+  меткой. Метки ставятся до коммита, поэтому копия должна быть
+  моложе метки еще на REPLICA_SNAPSHOT_MARGIN.
+"""
+import random
+import sqlite3
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_KEY = '_primary_until'
+SYNCED_KEY = 'replica:synced:{}'
+
+_alias = ContextVar('replica', default=None)
+
+
+def pin(request):
+    """Закрепляет сессию за основной базой после записи."""
+    request.session[PIN_KEY] = time.time() + settings.REPLICA_PIN_SECONDS
+
+
+def is_pinned(request):
+    session = getattr(request, 'session', None)
+    return session is not None and session.get(PIN_KEY, 0) > time.time()
+
+
+def choose(changed_at=0):
+    """
+    Случайная реплика, копия которой содержит изменения до changed_at
+    (метка в наносекундах), или None - читать из основной базы.
+    """
+    if changed_at is None or not settings.REPLICAS:
+        return None
+    margin = settings.REPLICA_SNAPSHOT_MARGIN * 10 ** 9
+    synced = cache.get_many(
+        [SYNCED_KEY.format(alias) for alias in settings.REPLICAS])
+    fresh = [alias for alias in settings.REPLICAS
+             if synced.get(SYNCED_KEY.format(alias), 0) - margin
+             >= changed_at]
+    return random.choice(fresh) if fresh else None
+
+
+def replica_reads(changed_at=lambda request: 0):
+    """
+    Декоратор view, которой подходит реплика. changed_at(request) -
+    время последнего изменения страницы в наносекундах или None,
+    если его не узнать (тогда чтение из основной базы).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            alias = (None if is_pinned(request)
+                     else choose(changed_at(request)))
+            token = _alias.set(alias)
+            try:
+                return view(request, *args, **kwargs)
+            finally:
+                _alias.reset(token)
+        return wrapper
+    return decorator
+
+
+class ReplicaRouter:
+    """Чтения REPLICA_APPS внутри replica_reads() - на реплику."""
+
+    def db_for_read(self, model, **hints):
+        alias = _alias.get()
+        if alias and model._meta.app_label in settings.REPLICA_APPS:
+            return alias
+        # Явно, иначе связанный объект читался бы из базы экземпляра,
+        # загруженного с реплики
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики - копии основной базы, связи между ними законны
+        pool = {DEFAULT_DB_ALIAS, *settings.REPLICAS}
+        return obj1._state.db in pool and obj2._state.db in pool
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Схема приходит на реплики вместе с копией
+        return db == DEFAULT_DB_ALIAS
+
+
+def sync(alias):
+    """Заменяет реплику согласованной копией основной базы."""
+    started = time.time_ns()
+    source = connections[DEFAULT_DB_ALIAS]
+    source.ensure_connection()
+    target = sqlite3.connect(connections[alias].settings_dict['NAME'])
+    try:
+        source.connection.backup(target)
+    finally:
+        target.close()
+    # Копия содержит все, что закоммичено до начала копирования
+    cache.set(SYNCED_KEY.format(alias), started, None)
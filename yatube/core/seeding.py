@@ -0,0 +1,262 @@
+"""
+Синтетические данные боевого объема для нагрузочных тестов.
+
+Строки пишутся через executemany: один подготовленный INSERT на
+строку, пачка в одной транзакции, без моделей и сигналов, с заранее
+известными id. Активность авторов подчиняется степенному закону:
+посты, комментарии и подписчики сосредоточены у немногих
+пользователей, как в живой соцсети, поэтому в базе появляются
+и «знаменитости» гибридной ленты.
+
+Данные делятся на куски по chunk_size строк. Генератор случайных
+чисел каждого куска заводится от зерна, вида записей и номера
+куска, поэтому при том же chunk_size результат не зависит от числа
+процессов: воркеры только готовят строки, а пишет их по порядку
+основной процесс (SQLite допускает одного писателя).
+"""
+import math
+import multiprocessing
+import random
+from collections import deque
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+
+from posts import counters, feed
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Префикс имен и slug по умолчанию, общий для seed и benchmark
+PREFIX = 'seed'
+
+YEAR = 365 * 86400
+
+FIELDS = {
+    'users': (User, (
+        'id', 'username', 'password', 'first_name', 'last_name', 'email',
+        'is_staff', 'is_active', 'is_superuser', 'date_joined')),
+    'posts': (Post, (
+        'id', 'text', 'pub_date', 'created', 'author', 'group', 'image',
+        'comments_count', 'version')),
+    'comments': (Comment, ('id', 'post', 'author', 'text', 'created')),
+    'follows': (Follow, ('user', 'author')),
+}
+
+LABELS = {
+    'users': 'Пользователи', 'posts': 'Посты',
+    'comments': 'Комментарии', 'follows': 'Подписки',
+}
+
+# Параметры генерации в процессе-воркере
+_params = {}
+
+
+def power_law(rng, size, exponent):
+    """Индекс от 0 до size-1 с вероятностью ~ 1 / (индекс + 1) ** exponent."""
+    # Обратная функция распределения непрерывного закона на [1, size + 1)
+    if exponent == 1:
+        rank = (size + 1) ** rng.random()
+    else:
+        power = 1 - exponent
+        rank = (((size + 1) ** power - 1) * rng.random() + 1) ** (1 / power)
+    return min(int(rank), size) - 1
+
+
+def _moment(rng):
+    moment = _params['now'] - timedelta(seconds=rng.randrange(YEAR))
+    return connection.ops.adapt_datetimefield_value(moment)
+
+
+def _user(rng, size):
+    return _params['first']['users'] + power_law(
+        rng, size, _params['exponent'])
+
+
+def _users(rng, start, count):
+    names = _params['names']
+    for number in range(start, start + count):
+        yield (
+            _params['first']['users'] + number,
+            f'{_params["prefix"]}_{number}', '!',
+            rng.choice(names['first']), rng.choice(names['last']), '',
+            False, True, False, _moment(rng),
+        )
+
+
+def _posts(rng, start, count):
+    groups, users = _params['groups'], _params['users']
+    for number in range(start, start + count):
+        pub_date = _moment(rng)
+        group_id = None
+        if groups and rng.random() < 0.7:
+            group_id = _params['first']['groups'] + power_law(
+                rng, groups, _params['exponent'])
+        yield (
+            _params['first']['posts'] + number, rng.choice(_params['texts']),
+            pub_date, pub_date, _user(rng, users), group_id, '', 0, 1,
+        )
+
+
+def _comments(rng, start, count):
+    for number in range(start, start + count):
+        post_id = _params['first']['posts'] + power_law(
+            rng, _params['posts'], _params['exponent'])
+        yield (
+            _params['first']['comments'] + number, post_id,
+            _user(rng, _params['users']),
+            rng.choice(_params['texts'])[:200], _moment(rng),
+        )
+
+
+def _follows(rng, start, count):
+    users, first = _params['users'], _params['first']['users']
+    step = _params['step']
+    for _ in range(count):
+        # Читатели равномерны, авторы - по степенному закону. Ранги
+        # переставлены: самые плодовитые авторы не обязаны быть самыми
+        # читаемыми, иначе ленты растут как произведение двух хвостов
+        user_id = first + rng.randrange(users)
+        rank = power_law(rng, users, _params['exponent'])
+        author_id = first + (rank + 1) * step % users
+        if user_id != author_id:
+            yield user_id, author_id
+
+
+GENERATORS = {
+    'users': _users, 'posts': _posts,
+    'comments': _comments, 'follows': _follows,
+}
+
+
+def _init(params):
+    _params.update(params)
+
+
+def _chunk(task):
+    kind, start, count = task
+    rng = random.Random(f'{_params["seed"]}:{kind}:{start}')
+    return list(GENERATORS[kind](rng, start, count))
+
+
+def _produce(pool, tasks, depth):
+    """Куски строк по порядку; воркеры опережают запись не больше depth."""
+    if pool is None:
+        yield from map(_chunk, tasks)
+        return
+    pending = deque()
+    for task in tasks:
+        pending.append(pool.apply_async(_chunk, (task,)))
+        if len(pending) >= depth:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def _insert(model, fields, rows, ignore_conflicts=False):
+    """Пишет строки одним executemany в транзакции."""
+    opts, ops = model._meta, connection.ops
+    columns = ', '.join(
+        ops.quote_name(opts.get_field(name).column) for name in fields)
+    placeholders = ', '.join(['%s'] * len(fields))
+    sql = (
+        f'{ops.insert_statement(ignore_conflicts=ignore_conflicts)} '
+        f'{ops.quote_name(opts.db_table)} ({columns}) '
+        f'VALUES ({placeholders}) '
+        f'{ops.ignore_conflicts_suffix_sql(ignore_conflicts)}'
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(sql.rstrip(), rows)
+
+
+def _coprime(size):
+    """Шаг, при котором i * step % size перебирает все числа до size."""
+    step = int(size * 0.618) | 1
+    while math.gcd(step, size) != 1:
+        step += 2
+    return step
+
+
+def _first_id(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+def generate(users=100000, groups=1000, posts=1000000, comments=500000,
+             follows=500000, random_seed=0, workers=1, chunk_size=10000,
+             exponent=1.1, prefix=PREFIX, log=print):
+    """
+    Наполняет базу: пользователи prefix_N, группы prefix-N, посты,
+    комментарии и подписки; затем пересчитывает счетчики и ленты.
+    Подписок выходит немного меньше follows: повторы пропускаются.
+    """
+    if User.objects.filter(username__startswith=f'{prefix}_').exists():
+        raise ValueError(f'В базе уже есть данные с префиксом {prefix}')
+    fake = Faker('ru_RU')
+    fake.seed_instance(random_seed)
+    params = {
+        'seed': random_seed, 'prefix': prefix, 'exponent': exponent,
+        'now': timezone.now(),
+        'users': users, 'groups': groups, 'posts': posts,
+        'step': _coprime(users),
+        'texts': [fake.text(max_nb_chars=300) for _ in range(1000)],
+        'names': {
+            'first': [fake.first_name() for _ in range(500)],
+            'last': [fake.last_name() for _ in range(500)],
+        },
+        'first': {
+            'users': _first_id(User), 'groups': _first_id(Group),
+            'posts': _first_id(Post), 'comments': _first_id(Comment),
+        },
+    }
+
+    log(f'Группы: {groups}')
+    Group.objects.bulk_create([
+        Group(pk=params['first']['groups'] + number,
+              title=fake.word().capitalize(), slug=f'{prefix}-{number}',
+              description=fake.sentence())
+        for number in range(groups)])
+
+    pool = None
+    if workers > 1:
+        # Воркеры наследуют настроенный Django через fork, но не
+        # открытое соединение с БД
+        connections.close_all()
+        pool = multiprocessing.get_context('fork').Pool(
+            workers, _init, (params,))
+    else:
+        _params.update(params)
+    try:
+        for kind, total in (('users', users),
+                            ('posts', posts if users else 0),
+                            ('comments', comments if users and posts else 0),
+                            ('follows', follows if users > 1 else 0)):
+            log(f'{LABELS[kind]}: {total}')
+            model, fields = FIELDS[kind]
+            tasks = [(kind, start, min(chunk_size, total - start))
+                     for start in range(0, total, chunk_size)]
+            for rows in _produce(pool, tasks, 2 * workers):
+                _insert(model, fields, rows,
+                        ignore_conflicts=kind == 'follows')
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        _params.clear()
+
+    # Id заданы явно: последовательности (PostgreSQL) догоняют их
+    sequences = connection.ops.sequence_reset_sql(
+        no_style(), [User, Group, Post, Comment])
+    with connection.cursor() as cursor:
+        for sql in sequences:
+            cursor.execute(sql)
+
+    log('Счетчики и ленты подписок')
+    counters.reconcile(chunk_size)
+    feed.rebuild()
+    cache.clear()
@@ -0,0 +1,75 @@
+"""
+Настройка SQLite для конкурентной нагрузки.
+
+configure() вызывается на каждое новое соединение (connection_created)
+и выставляет PRAGMA из SQLITE_PRAGMAS. В режиме WAL читатели не ждут
+писателя, а busy_timeout заставляет писателей ждать блокировку, а не
+падать сразу.
+
+Пишущие транзакции открывает immediate(): BEGIN IMMEDIATE
+(core.backends.sqlite3) ставит писателей в очередь. Если очередь
+дольше busy_timeout, короткие записи из view повторяет
+write_transaction(): транзакция откатывается и повторяется с паузой.
+"""
+import logging
+import random
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import OperationalError, transaction
+
+logger = logging.getLogger(__name__)
+
+
+def configure(sender, connection, **kwargs):
+    """Выставляет PRAGMA новому соединению SQLite."""
+    if connection.vendor != 'sqlite':
+        return
+    # Напрямую через sqlite3: служебные запросы не попадают
+    # ни в счетчики SQL, ни в connection.queries
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+def is_locked(error):
+    return isinstance(error, OperationalError) and 'locked' in str(error)
+
+
+@contextmanager
+def immediate(using=None):
+    """
+    atomic(), который сразу берет блокировку записи (BEGIN IMMEDIATE).
+    Для транзакций, которые пишут, прочитав перед этим данные.
+    """
+    connection = transaction.get_connection(using)
+    previous = getattr(connection, 'begin_immediate', False)
+    connection.begin_immediate = True
+    try:
+        with transaction.atomic(using):
+            yield
+    finally:
+        connection.begin_immediate = previous
+
+
+def write_transaction(func, *args, **kwargs):
+    """
+    Выполняет func(*args, **kwargs) в транзакции, повторяя ее до
+    SQLITE_WRITE_RETRIES раз, если база занята. Внутри внешней
+    транзакции повторять нечего: ошибка уходит наружу.
+    """
+    retries = settings.SQLITE_WRITE_RETRIES
+    for attempt in range(retries + 1):
+        nested = transaction.get_connection().in_atomic_block
+        try:
+            with immediate():
+                return func(*args, **kwargs)
+        except OperationalError as error:
+            if nested or attempt == retries or not is_locked(error):
+                raise
+            logger.warning('База занята, повтор %s из %s',
+                           attempt + 1, retries)
+        # Экспоненциальная пауза со случайным разбросом, чтобы
+        # столкнувшиеся писатели не повторяли хором
+        time.sleep(settings.SQLITE_RETRY_DELAY * 2 ** attempt
+                   * random.uniform(0.5, 1.5))
@@ -0,0 +1,87 @@
+"""
+Защита от «стада» при пересчете дорогих значений кэша.
+
+Значение хранится вместе с поколением, сроком свежести и временем
+пересчета. Пересчитывает только тот, кто взял блокировку (cache.add),
+остальные отдают прежнюю копию или недолго ждут новую. Незадолго до
+истечения значение с растущей вероятностью пересчитывается заранее
+(XFetch), поэтому одновременного истечения у всех читателей нет.
+Если БД не отвечает, прежняя копия отдается еще STALE_TIMEOUT секунд.
+"""
+import logging
+import math
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError
+
+logger = logging.getLogger(__name__)
+
+LOCK_KEY = 'lock:{}'
+POLL_INTERVAL = 0.05
+
+
+def _is_fresh(entry, generation, now):
+    if entry['generation'] != generation:
+        return False
+    # XFetch: чем дольше пересчет и ближе срок, тем вероятнее ранний
+    early = entry['delta'] * -math.log(1.0 - random.random())
+    return now + early < entry['expires']
+
+
+def _is_usable(entry, now):
+    """Прежняя копия, которую еще можно отдать вместо новой."""
+    return (entry is not None
+            and now < entry['expires'] + settings.CACHE_STALE_TIMEOUT)
+
+
+def _wait(key, generation):
+    """Ждет значение, которое пересчитывает другой процесс."""
+    deadline = time.monotonic() + settings.CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None and entry['generation'] == generation:
+            return entry
+    return None
+
+
+def fetch(key, generation, compute, timeout):
+    """
+    Значение по ключу; compute() вызывается, если значения нет,
+    у него другое поколение или истек (или досрочно истекает) срок.
+    """
+    entry = cache.get(key)
+    now = time.time()
+    if entry is not None and _is_fresh(entry, generation, now):
+        return entry['value']
+    lock_key = LOCK_KEY.format(key)
+    locked = cache.add(lock_key, True, settings.CACHE_LOCK_TIMEOUT)
+    if not locked:
+        if _is_usable(entry, now):
+            return entry['value']
+        fresh = _wait(key, generation)
+        if fresh is not None:
+            return fresh['value']
+    try:
+        started = time.monotonic()
+        value = compute()
+        delta = time.monotonic() - started
+    except DatabaseError:
+        if not _is_usable(entry, now):
+            raise
+        logger.warning('БД недоступна, отдается прежняя копия %s', key,
+                       exc_info=True)
+        return entry['value']
+    finally:
+        if locked:
+            cache.delete(lock_key)
+    cache.set(key, {
+        'value': value,
+        'generation': generation,
+        'expires': time.time() + timeout,
+        'delta': delta,
+    }, timeout + settings.CACHE_STALE_TIMEOUT)
+    return value
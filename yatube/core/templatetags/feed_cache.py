@@ -0,0 +1,50 @@
+from django import template
+from django.core.cache.utils import make_template_fragment_key
+
+from core import stampede
+
+register = template.Library()
+
+
+class FeedCacheNode(template.Node):
+    def __init__(self, nodelist, timeout, fragment_name, generation, vary_on):
+        self.nodelist = nodelist
+        self.timeout = timeout
+        self.fragment_name = fragment_name
+        self.generation = generation
+        self.vary_on = vary_on
+
+    def render(self, context):
+        timeout = int(self.timeout.resolve(context))
+        generation = str(self.generation.resolve(context))
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        key = make_template_fragment_key(self.fragment_name, vary_on)
+        return stampede.fetch(
+            key, generation, lambda: self.nodelist.render(context), timeout)
+
+
+@register.tag
+def feed_cache(parser, token):
+    """
+    Как {% cache %}, но с поколением отдельным аргументом и защитой
+    от одновременного пересчета (core.stampede). Поколение не входит
+    в ключ: пока один запрос перерисовывает фрагмент, остальные
+    получают прежнюю копию.
+    Использование:
+    {% feed_cache timeout name generation [var1 var2 ...] %}
+        ...
+    {% endfeed_cache %}
+    """
+    nodelist = parser.parse(('endfeed_cache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 4:
+        raise template.TemplateSyntaxError(
+            f'{tokens[0]!r} ждет timeout, имя фрагмента и поколение')
+    return FeedCacheNode(
+        nodelist,
+        parser.compile_filter(tokens[1]),
+        tokens[2],
+        parser.compile_filter(tokens[3]),
+        [parser.compile_filter(bit) for bit in tokens[4:]],
+    )
@@ -0,0 +1,36 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+
+class HoleNode(template.Node):
+    def __init__(self, nodelist, name, args):
+        self.nodelist = nodelist
+        self.name = name
+        self.args = args
+
+    def render(self, context):
+        label = ':'.join([self.name, *(
+            str(arg.resolve(context)) for arg in self.args)])
+        return mark_safe(f'<!--hole:{label}-->{self.nodelist.render(context)}'
+                         '<!--/hole-->')
+
+
+@register.tag
+def hole(parser, token):
+    """
+    Отмечает персональную часть страницы (core.pagecache): в кэше
+    хранится ее вариант для гостя, а вошедшему читателю она
+    подставляется заново. Аргументы - числа (id), без двоеточий.
+    Использование:
+    {% hole 'follow' author.pk %}...{% endhole %}
+    """
+    nodelist = parser.parse(('endhole',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 2:
+        raise template.TemplateSyntaxError(
+            f'{tokens[0]!r} ждет имя дыры')
+    return HoleNode(nodelist, tokens[1].strip('\'"'),
+                    [parser.compile_filter(bit) for bit in tokens[2:]])
@@ -0,0 +1,70 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from core import benchmark
+
+
+class BenchmarkTest(TestCase):
+    """Тест бенчмарка страниц"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        benchmark.seed(users=20, groups=3, posts=200, comments=50,
+                       follows=60, log=lambda message: None)
+
+    def test_seed_is_reproducible(self):
+        """Повторное наполнение той же базы запрещено"""
+        with self.assertRaises(ValueError):
+            benchmark.seed(users=1, log=lambda message: None)
+
+    def test_run_measures_all_views(self):
+        """Замеры есть для каждой страницы, ответы без ошибок"""
+        # На прогретом кэше главная обходится без SQL
+        result = benchmark.run(requests=2, cold=True)
+        self.assertEqual(
+            set(result['views']),
+            {name for name, _, _ in benchmark.scenarios()})
+        for view in result['views'].values():
+            self.assertGreater(view['queries'], 0)
+            self.assertLessEqual(view['p50'], view['p99'])
+        self.assertEqual(result['meta']['rows']['Post'], 200)
+
+    def test_benchmark_finds_seeded_data(self):
+        """benchmark мерит данные команды seed с тем же префиксом"""
+        call_command('seed', '--users', '5', '--groups', '1', '--posts',
+                     '10', '--comments', '3', '--follows', '4',
+                     '--prefix', 'other', stdout=StringIO())
+        out = StringIO()
+        call_command('benchmark', '--prefix', 'other', requests=1,
+                     stdout=out)
+        self.assertIn('follow_index', out.getvalue())
+        with self.assertRaises(ValueError):
+            benchmark.scenarios('missing')
+
+    def test_compare(self):
+        """Рост p95 сверх порога и лишние запросы - регрессия"""
+        baseline = {'views': {'index': {
+            'p95': 10.0, 'queries': 5, 'errors': 0}}}
+        same = {'views': {'index': {
+            'p95': 11.0, 'queries': 5, 'errors': 0}}}
+        slower = {'views': {'index': {
+            'p95': 40.0, 'queries': 6, 'errors': 0}}}
+        self.assertEqual(benchmark.compare(same, baseline), [])
+        self.assertEqual(len(benchmark.compare(slower, baseline)), 2)
+
+    def test_command_compare_fails_on_regression(self):
+        """Команда падает, если результат хуже эталона"""
+        baseline = {'views': {'follow_index': {
+            'p95': 0.0, 'queries': 0, 'errors': 0}}}
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'baseline.json')
+            with open(path, 'w') as file:
+                json.dump(baseline, file)
+            with self.assertRaises(CommandError):
+                call_command('benchmark', requests=1, compare=path,
+                             stdout=StringIO())
@@ -0,0 +1,66 @@
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase
+
+from core.cache import TwoTierCache
+
+
+class TwoTierCacheTest(SimpleTestCase):
+    """Тест двухуровневого кэша"""
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location, ignore_errors=True)
+        # Два экземпляра на одном каталоге - как два воркера
+        self.first = self.worker()
+        self.second = self.worker()
+
+    def worker(self):
+        return TwoTierCache(self.location, {
+            'OPTIONS': {'L1_MAX_ENTRIES': 3, 'L1_TIMEOUT': 60}})
+
+    def test_shared_between_workers(self):
+        """Запись одного воркера видна другому"""
+        self.first.set('key', 'value')
+        self.assertEqual(self.second.get('key'), 'value')
+        self.assertEqual(self.second.get_many(['key', 'missing']),
+                         {'key': 'value'})
+
+    def test_invalidation_reaches_other_l1(self):
+        """Изменение в одном воркере выбрасывает копию из L1 другого"""
+        self.first.set('key', 'old')
+        self.assertEqual(self.second.get('key'), 'old')
+        # В журнале воркеры различаются по pid, здесь он у них общий
+        self.first._publish = lambda *keys: self.publish_as_other(keys)
+        self.first.set('key', 'new')
+        self.assertEqual(self.second.get('key'), 'new')
+        self.first.delete('key')
+        self.assertIsNone(self.second.get('key'))
+
+    def publish_as_other(self, keys):
+        with open(self.first._journal, 'a') as journal:
+            journal.writelines(f'0 {key}\n' for key in keys)
+
+    def test_l1_is_bounded(self):
+        """L1 вытесняет давно не читанные ключи"""
+        for number in range(5):
+            self.first.set(f'key{number}', number)
+        self.assertEqual(len(self.first._l1), 3)
+        self.assertEqual(self.first.get('key0'), 0)
+
+    def test_journal_restart_clears_l1(self):
+        """После ротации журнала L1 очищается целиком"""
+        self.first.set('key', 'value')
+        self.assertEqual(self.first.get('key'), 'value')
+        self.second._journal_max_size = 0
+        self.second.set('other', 1)
+        self.first._sync()
+        self.assertNotIn(self.first.make_key('key'), self.first._l1)
+
+    def test_add_is_exclusive(self):
+        """add между воркерами срабатывает только у одного"""
+        self.assertTrue(self.first.add('lock', 1))
+        self.assertFalse(self.second.add('lock', 2))
+        self.assertEqual(self.second.get('lock'), 1)
+        self.first.delete('lock')
+        self.assertTrue(self.second.add('lock', 2))
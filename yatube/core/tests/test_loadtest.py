@@ -0,0 +1,69 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import OperationalError
+from django.db.backends.sqlite3.base import SQLiteCursorWrapper
+from django.test import TransactionTestCase
+
+from core import loadtest
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class LoadTest(TransactionTestCase):
+    """Тест нагрузочного прогона (потоки видят только закоммиченное)"""
+
+    def setUp(self):
+        author = User.objects.create_user(username='author')
+        User.objects.create_user(username='reader')
+        group = Group.objects.create(
+            title='Группа', slug='group', description='')
+        for number in range(5):
+            Post.objects.create(text=f'Котики номер {number}',
+                                author=author, group=group)
+
+    def test_mixed_workload(self):
+        """Чтения и записи проходят, статистика по каждой странице"""
+        result = loadtest.run(requests=15, threads=2, random_seed=1)
+        self.assertEqual(result['total']['requests'], 30)
+        self.assertEqual(result['total']['errors'], 0)
+        self.assertEqual(
+            sum(view['requests'] for view in result['views'].values()), 30)
+        view = result['views']['index']
+        self.assertLessEqual(view['p50'], view['p99'])
+
+    def test_writes_over_http(self):
+        """Через сокет формы проходят с CSRF-токеном"""
+        result = loadtest.run(
+            requests=3, threads=1, transport='http',
+            mix={'post_create': 1, 'add_comment': 1})
+        self.assertEqual(result['total']['errors'], 0)
+        self.assertEqual(
+            Post.objects.count() + Comment.objects.count(), 5 + 3)
+
+    def test_lock_timeouts_counted(self):
+        """Ошибки блокировки SQLite считаются отдельно"""
+        execute = SQLiteCursorWrapper.execute
+
+        def locked(cursor, query, params=None):
+            if query.startswith('INSERT INTO "posts_post"'):
+                raise OperationalError('database is locked')
+            return execute(cursor, query, params)
+
+        with mock.patch.object(SQLiteCursorWrapper, 'execute', locked):
+            result = loadtest.run(
+                requests=2, threads=2, mix={'post_create': 1})
+        self.assertEqual(result['total']['locks'], 4)
+        self.assertEqual(result['total']['lock_rate'], 1.0)
+
+    def test_command(self):
+        """Команда печатает итог и отвергает неизвестные страницы"""
+        out = StringIO()
+        call_command('loadtest', '--requests', '2', '--threads', '1',
+                     '--mix', 'index=1,profile=1', stdout=out)
+        self.assertIn('total', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('loadtest', '--mix', 'nope=1', stdout=StringIO())
@@ -0,0 +1,81 @@
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.metrics import registry
+from core.querycheck import RepeatedQueries, check, fingerprint
+from posts.models import Post
+
+User = get_user_model()
+
+
+class MetricsTest(TestCase):
+    """Тест метрик запросов"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.create(text='Тестовый текст', author=cls.user)
+
+    def setUp(self):
+        registry.clear()
+
+    def test_server_timing_header(self):
+        """Ответ несет Server-Timing с SQL, шаблонами и кэшем"""
+        response = Client().get(
+            reverse('posts:profile', args=[MetricsTest.user.username]))
+        timing = response['Server-Timing']
+        for metric in ('db;dur=', 'tpl;dur=', 'cache;desc=', 'total;dur='):
+            self.assertIn(metric, timing)
+        self.assertNotIn('desc="0 queries"', timing)
+
+    def test_metrics_endpoint(self):
+        """Гистограммы собираются по имени view"""
+        Client().get(reverse('posts:index'))
+        Client().get(reverse('posts:index'))
+        response = Client().get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        # Второй запрос гостя отдан из кэша страниц
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="posts:index"} 1',
+            body)
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="page_cache"} 1',
+            body)
+        self.assertIn('yatube_cache_requests_total{view="posts:index",'
+                      'result="hit"}', body)
+
+    def test_metrics_endpoint_is_private(self):
+        """Посторонним адресам метрики не отдаются"""
+        response = Client(REMOTE_ADDR='203.0.113.1').get(reverse('metrics'))
+        self.assertEqual(response.status_code, 404)
+
+
+class QueryCheckTest(TestCase):
+    """Тест поиска N+1"""
+    def test_fingerprint(self):
+        """Значения и списки IN не меняют форму запроса"""
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s) LIMIT 21'),
+            fingerprint('SELECT * FROM t WHERE id IN (%s) LIMIT 1'))
+
+    @override_settings(QUERY_REPEAT_LIMIT=3, QUERY_REPEAT_RAISE=True)
+    def test_repeated_queries_raise(self):
+        """Повтор запроса в цикле сверх предела поднимает исключение"""
+        shapes = Counter()
+        for _ in range(3):
+            check(shapes, 'SELECT 1')
+        with self.assertRaises(RepeatedQueries):
+            check(shapes, 'SELECT 1')
+
+    @override_settings(QUERY_REPEAT_LIMIT=3, QUERY_REPEAT_RAISE=False)
+    def test_repeated_queries_logged(self):
+        """Без RAISE повтор только пишется в лог, один раз"""
+        shapes = Counter()
+        with self.assertLogs('core.querycheck', 'WARNING') as logs:
+            for _ in range(6):
+                check(shapes, 'SELECT 1')
+        self.assertEqual(len(logs.records), 1)
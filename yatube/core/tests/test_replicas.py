@@ -0,0 +1,81 @@
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.test import override_settings
+from django.urls import reverse
+
+from core import replicas
+from posts.models import Post
+
+User = get_user_model()
+
+
+@override_settings(REPLICAS=['replica1', 'replica2'])
+class ReplicaRouterTest(SimpleTestCase):
+    """Тест выбора реплики и маршрутизации"""
+
+    def setUp(self):
+        cache.clear()
+        self.now = time.time_ns()
+        cache.set(replicas.SYNCED_KEY.format('replica1'), self.now)
+        self.request = RequestFactory().get('/')
+        self.request.session = {}
+
+    def routes(self, changed_at):
+        """Куда читаются посты и пользователи внутри view."""
+        @replicas.replica_reads(lambda request: changed_at)
+        def view(request):
+            return router.db_for_read(Post), router.db_for_read(User)
+        return view(self.request)
+
+    def test_fresh_replica(self):
+        """Посты - с реплики, снятой после изменения, остальное - нет"""
+        changed = self.now - 2 * 10 ** 9
+        self.assertEqual(self.routes(changed), ('replica1', 'default'))
+        self.assertEqual(router.db_for_read(Post), 'default')
+        self.assertEqual(router.db_for_write(Post), 'default')
+
+    def test_stale_replica(self):
+        """Копия старше изменения или времени нет - основная база"""
+        self.assertEqual(self.routes(self.now), ('default', 'default'))
+        self.assertEqual(self.routes(None), ('default', 'default'))
+
+    def test_pinned_session(self):
+        """После записи сессия читает из основной базы"""
+        replicas.pin(self.request)
+        self.assertEqual(self.routes(0), ('default', 'default'))
+        self.request.session[replicas.PIN_KEY] = time.time() - 1
+        self.assertEqual(self.routes(0), ('replica1', 'default'))
+
+    def test_migrate_only_primary(self):
+        """Миграции только в основной базе"""
+        self.assertTrue(router.allow_migrate('default', 'posts'))
+        self.assertFalse(router.allow_migrate('replica1', 'posts'))
+
+
+class ReplicaViewsTest(TestCase):
+    """Тест закрепления сессии в view"""
+
+    def setUp(self):
+        # Без страниц, сохраненных другими тестами
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.client.force_login(self.reader)
+
+    @mock.patch('core.replicas.choose', return_value=None)
+    def test_write_pins_session(self, choose):
+        """Подписка закрепляет сессию, реплика больше не выбирается"""
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(choose.call_count, 1)
+        self.assertIsInstance(choose.call_args[0][0], int)
+        self.client.get(
+            reverse('posts:profile_follow', args=['author']))
+        self.assertIn(replicas.PIN_KEY, self.client.session)
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:profile', args=['author']))
+        self.assertEqual(choose.call_count, 1)
@@ -0,0 +1,78 @@
+import random
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db.models import Count, Sum
+from django.test import TestCase
+
+from core import seeding
+from posts.models import Comment, Follow, Group, Post, UserCounters
+
+User = get_user_model()
+
+
+def quiet(message):
+    pass
+
+
+class SeedingTest(TestCase):
+    """Тест генератора синтетических данных"""
+    sizes = {'users': 30, 'groups': 4, 'posts': 300, 'comments': 100,
+             'follows': 80}
+
+    def snapshot(self, prefix):
+        """Посты без зависящих от запуска id и дат."""
+        return sorted(
+            (post.author.username[len(prefix):], post.text,
+             post.group.slug[len(prefix):] if post.group else '')
+            for post in Post.objects.filter(
+                author__username__startswith=f'{prefix}_'
+            ).select_related('author', 'group'))
+
+    def test_generate(self):
+        """Объемы, степенной закон и пересчитанные счетчики"""
+        seeding.generate(chunk_size=64, log=quiet, **self.sizes)
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Group.objects.count(), 4)
+        self.assertEqual(Post.objects.count(), 300)
+        self.assertEqual(Comment.objects.count(), 100)
+        self.assertTrue(0 < Follow.objects.count() <= 80)
+        authors = list(Post.objects.values('author').annotate(
+            total=Count('pk')).order_by('-total').values_list(
+            'total', flat=True))
+        self.assertGreater(authors[0], 5 * authors[len(authors) // 2])
+        self.assertEqual(UserCounters.objects.aggregate(
+            total=Sum('posts_count'))['total'], 300)
+        self.assertEqual(Group.objects.aggregate(
+            total=Sum('posts_count'))['total'],
+            Post.objects.exclude(group=None).count())
+        with self.assertRaises(ValueError):
+            seeding.generate(users=1, log=quiet)
+
+    def test_workers_do_not_change_data(self):
+        """Данные зависят только от зерна, а не от числа процессов"""
+        seeding.generate(prefix='one', chunk_size=50, log=quiet,
+                         **self.sizes)
+        seeding.generate(prefix='two', workers=2, chunk_size=50,
+                         log=quiet, **self.sizes)
+        seeding.generate(prefix='tri', random_seed=1, chunk_size=50,
+                         log=quiet, **self.sizes)
+        self.assertEqual(self.snapshot('one'), self.snapshot('two'))
+        self.assertNotEqual(self.snapshot('one'), self.snapshot('tri'))
+
+    def test_power_law_range(self):
+        """Индексы не выходят за границы и смещены к началу"""
+        rng = random.Random(0)
+        values = [seeding.power_law(rng, 10, 1.1) for _ in range(2000)]
+        self.assertEqual(set(values), set(range(10)))
+        self.assertGreater(values.count(0), values.count(9) * 3)
+
+    def test_command(self):
+        """Команда seed наполняет базу и не повторяет префикс"""
+        out = StringIO()
+        call_command('seed', '--users', '5', '--groups', '1', '--posts',
+                     '10', '--comments', '3', '--follows', '4', stdout=out)
+        self.assertIn('База наполнена', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('seed', '--users', '1', stdout=StringIO())
@@ -0,0 +1,63 @@
+from unittest import mock
+
+from django.db import OperationalError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from core import sqlite
+
+
+class PragmaTest(TestCase):
+    """Тест настройки соединения"""
+
+    def test_pragmas(self):
+        """PRAGMA из настроек выставлены соединению"""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+
+
+@override_settings(SQLITE_RETRY_DELAY=0)
+class WriteTransactionTest(TransactionTestCase):
+    """Тест повторов записи (вне транзакции теста)"""
+
+    def test_begin_immediate(self):
+        """Пишущая транзакция сразу берет блокировку записи"""
+        with CaptureQueriesContext(connection) as queries:
+            sqlite.write_transaction(lambda: None)
+            with sqlite.immediate():
+                pass
+        self.assertEqual([query['sql'] for query in queries],
+                         ['BEGIN IMMEDIATE', 'BEGIN IMMEDIATE'])
+
+    def test_plain_atomic_is_deferred(self):
+        """Прочие atomic() не встают в очередь писателей"""
+        with CaptureQueriesContext(connection) as queries:
+            with transaction.atomic():
+                pass
+        self.assertEqual(queries[0]['sql'], 'BEGIN')
+
+    def test_retries_when_locked(self):
+        """Занятая база - повтор, другие ошибки - сразу наружу"""
+        func = mock.Mock(side_effect=[
+            OperationalError('database is locked'), 'ok'])
+        with self.assertLogs('core.sqlite', 'WARNING'):
+            self.assertEqual(sqlite.write_transaction(func, 1), 'ok')
+        func.assert_called_with(1)
+        func = mock.Mock(side_effect=OperationalError('no such table'))
+        with self.assertRaises(OperationalError):
+            sqlite.write_transaction(func)
+        self.assertEqual(func.call_count, 1)
+
+    @override_settings(SQLITE_WRITE_RETRIES=2)
+    def test_gives_up(self):
+        """После всех повторов и внутри транзакции ошибка уходит наружу"""
+        func = mock.Mock(side_effect=OperationalError('database is locked'))
+        with self.assertLogs('core.sqlite', 'WARNING'):
+            with self.assertRaises(OperationalError):
+                sqlite.write_transaction(func)
+        self.assertEqual(func.call_count, 3)
+        func.reset_mock()
+        with self.assertRaises(OperationalError), transaction.atomic():
+            sqlite.write_transaction(func)
+        self.assertEqual(func.call_count, 1)
@@ -0,0 +1,77 @@
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import OperationalError
+from django.test import SimpleTestCase, override_settings
+
+from core import stampede
+
+
+@override_settings(CACHE_STALE_TIMEOUT=60, CACHE_LOCK_WAIT=0.1)
+class FetchTest(SimpleTestCase):
+    """Тест пересчета значений кэша без «стада»"""
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self, value='value'):
+        def compute():
+            self.calls += 1
+            return value
+        return compute
+
+    def broken(self):
+        raise OperationalError('database is locked')
+
+    def test_fresh_value_is_not_recomputed(self):
+        """Свежее значение берется из кэша"""
+        stampede.fetch('key', 'g1', self.compute(), 60)
+        self.assertEqual(stampede.fetch('key', 'g1', self.compute(), 60),
+                         'value')
+        self.assertEqual(self.calls, 1)
+
+    def test_new_generation_is_recomputed(self):
+        """Смена поколения - пересчет тем, кто взял блокировку"""
+        stampede.fetch('key', 'g1', self.compute('old'), 60)
+        self.assertEqual(
+            stampede.fetch('key', 'g2', self.compute('new'), 60), 'new')
+        self.assertFalse(cache.has_key(stampede.LOCK_KEY.format('key')))
+
+    def test_others_get_stale_copy_while_recomputing(self):
+        """Пока один пересчитывает, остальные получают прежнюю копию"""
+        stampede.fetch('key', 'g1', self.compute('old'), 60)
+        cache.add(stampede.LOCK_KEY.format('key'), True)
+        self.assertEqual(
+            stampede.fetch('key', 'g2', self.compute('new'), 60), 'old')
+        self.assertEqual(self.calls, 1)
+
+    def test_waits_when_there_is_no_copy(self):
+        """Без копии ждут недолго, затем считают сами"""
+        cache.add(stampede.LOCK_KEY.format('key'), True)
+        self.assertEqual(stampede.fetch('key', 'g1', self.compute(), 60),
+                         'value')
+        self.assertEqual(self.calls, 1)
+
+    def test_early_expiration(self):
+        """Перед истечением значение пересчитывается заранее"""
+        stampede.fetch('key', 'g1', self.compute(), 60)
+        entry = cache.get('key')
+        entry['delta'] = 10.0
+        entry['expires'] = time.time() + 0.001
+        cache.set('key', entry)
+        with mock.patch('random.random', return_value=0.5):
+            stampede.fetch('key', 'g1', self.compute(), 60)
+        self.assertEqual(self.calls, 2)
+
+    def test_stale_copy_on_database_error(self):
+        """При ошибке БД отдается прежняя копия, но не дольше окна"""
+        stampede.fetch('key', 'g1', self.compute('old'), 60)
+        with self.assertLogs('core.stampede', 'WARNING'):
+            self.assertEqual(
+                stampede.fetch('key', 'g2', self.broken, 60), 'old')
+        entry = cache.get('key')
+        entry['expires'] = time.time() - 61
+        cache.set('key', entry)
+        with self.assertRaises(OperationalError):
+            stampede.fetch('key', 'g2', self.broken, 60)
@@ -1,6 +1,9 @@
 from django.contrib import admin
+from django.http import StreamingHttpResponse
 
+from . import export
 from .models import Group, Post
+from .search import fts_available, matching_ids
 
 
 @admin.register(Post)
@@ -17,6 +20,34 @@ class PostAdmin(admin.ModelAdmin):
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
+    actions = ('export_ndjson', 'export_csv')
+
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск через индекс FTS5 вместо LIKE '%q%'"""
+        if not search_term.strip() or not fts_available():
+            return super().get_search_results(
+                request, queryset, search_term)
+        return queryset.filter(pk__in=matching_ids(search_term)), False
+
+    def export(self, queryset, fmt, content_type):
+        """Выбранные посты потоком, как в manage.py export_posts"""
+        records = export.queryset('posts').filter(
+            pk__in=queryset.values('pk'))
+        rows = (row for chunk in export.chunks('posts', records)
+                for row in chunk)
+        response = StreamingHttpResponse(
+            export.lines('posts', rows, fmt), content_type=content_type)
+        response['Content-Disposition'] = (
+            f'attachment; filename="posts.{fmt}"')
+        return response
+
+    def export_ndjson(self, request, queryset):
+        return self.export(queryset, 'ndjson', 'application/x-ndjson')
+    export_ndjson.short_description = 'Выгрузить в NDJSON'
+
+    def export_csv(self, request, queryset):
+        return self.export(queryset, 'csv', 'text/csv')
+    export_csv.short_description = 'Выгрузить в CSV'
 
 
 @admin.register(Group)
@@ -0,0 +1,159 @@
+"""
+Поколения (generation counters) для ключей кэша лент.
+
+Поколение - это метка, входящая в ключ фрагмента. Вместо удаления
+фрагментов сигналы просто выдают новую метку, и старые фрагменты
+перестают находиться, а затем вытесняются по TTL. Поэтому TTL
+можно держать в часах без риска показать устаревшую ленту.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+
+from core import pagecache
+
+from . import feed
+from .feed import is_celebrity
+from .models import Follow, Post
+
+INDEX_KEY = 'generation:index'
+CARDS_KEY = 'generation:cards'
+FOLLOW_KEY = 'generation:follow:{}'
+AUTHOR_KEY = 'generation:author:{}'
+THREAD_KEY = 'generation:thread:{}'
+# Меняется, когда любой автор пересекает порог популярности
+CELEBRITIES_KEY = 'generation:celebrities'
+CELEBRITY_IDS_KEY = 'celebrities:{}:{}'
+
+# Суррогатные ключи страниц в кэше для анонимов (core.pagecache)
+ALL_PAGES = 'pages'
+INDEX_PAGES = 'index'
+POST_PAGES = 'post:{}'
+AUTHOR_PAGES = 'author:{}'
+GROUP_PAGES = 'group:{}'
+
+
+def _token():
+    # Метка не повторяется и после вытеснения ключа из кэша
+    return str(time.time_ns())
+
+
+def generations(keys):
+    """Метки по ключам; недостающие создаются."""
+    values = cache.get_many(keys)
+    missing = {key: _token() for key in keys if key not in values}
+    if missing:
+        cache.set_many(missing, None)
+        values.update(missing)
+    return [values[key] for key in keys]
+
+
+def bump(*keys):
+    if keys:
+        cache.set_many(dict.fromkeys(keys, _token()), None)
+
+
+def index_generation():
+    """Поколение главной: любые изменения постов и карточек."""
+    return ':'.join(generations([INDEX_KEY, CARDS_KEY]))
+
+
+def follow_generation(user, celebrity_ids=()):
+    """
+    Поколение ленты подписок читателя. Популярные авторы в ленту
+    не пишутся, поэтому их поколения входят в ключ отдельно.
+    """
+    keys = [CARDS_KEY, FOLLOW_KEY.format(user.pk)]
+    keys += [AUTHOR_KEY.format(pk) for pk in celebrity_ids]
+    return ':'.join(generations(keys))
+
+
+def viewer_generation(user):
+    """
+    Часть ключа страниц с флагами читателя (подписан ли он на
+    авторов карточек); меняется при его подписках и отписках.
+    """
+    if not user.is_authenticated:
+        return 'anonymous'
+    return f'{user.pk}:{generations([FOLLOW_KEY.format(user.pk)])[0]}'
+
+
+def thread_generation(post_id):
+    """Поколение ветки комментариев поста (и имен их авторов)."""
+    return ':'.join(generations([CARDS_KEY, THREAD_KEY.format(post_id)]))
+
+
+def bump_thread(post_id):
+    bump(THREAD_KEY.format(post_id))
+
+
+def celebrity_authors(user):
+    """
+    Популярные авторы среди подписок читателя (feed.celebrity_authors)
+    из кэша: список меняется только при подписках читателя и при
+    пересечении порога кем-то из авторов.
+    """
+    marker = ':'.join(generations(
+        [FOLLOW_KEY.format(user.pk), CELEBRITIES_KEY]))
+    key = CELEBRITY_IDS_KEY.format(user.pk, marker)
+    ids = cache.get(key)
+    if ids is None:
+        ids = feed.celebrity_authors(user)
+        cache.set(key, ids, settings.FEED_CACHE_TIMEOUT)
+    return ids
+
+
+def bump_celebrities():
+    bump(CELEBRITIES_KEY)
+
+
+def bump_follow(user_ids):
+    bump(*(FOLLOW_KEY.format(pk) for pk in user_ids))
+
+
+def bump_author_feeds(author_id):
+    """Посты автора изменились: сбрасываются главная и ленты подписчиков."""
+    bump(INDEX_KEY, AUTHOR_KEY.format(author_id))
+    if is_celebrity(author_id):
+        return
+    follower_ids = list(Follow.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True))
+    bump_follow(follower_ids)
+
+
+def bump_cards():
+    """Изменились группа или автор: сбрасываются все ленты."""
+    bump(CARDS_KEY)
+    pagecache.purge(ALL_PAGES)
+
+
+def purge_post_pages(*posts):
+    """
+    Сбрасывает страницы для анонимов, где видны посты.
+    posts - тройки (id, author_id, group_id).
+    """
+    tags = {INDEX_PAGES}
+    for post_id, author_id, group_id in posts:
+        tags.add(POST_PAGES.format(post_id))
+        tags.add(AUTHOR_PAGES.format(author_id))
+        if group_id is not None:
+            tags.add(GROUP_PAGES.format(group_id))
+    pagecache.purge(*tags)
+
+
+def bump_card_versions(posts):
+    """Устаревшие карточки постов больше не найдутся в кэше."""
+    posts.update(version=F('version') + 1)
+
+
+def bump_post_cards(**filters):
+    """Перерисовать карточки отобранных постов и ленты, где они есть."""
+    posts = Post.objects.filter(**filters)
+    rows = list(posts.values_list('pk', 'author_id', 'group_id'))
+    bump_card_versions(posts)
+    for author_id in {author_id for _, author_id, _ in rows}:
+        bump_author_feeds(author_id)
+    if rows:
+        purge_post_pages(*rows)
@@ -0,0 +1,91 @@
+"""
+Условные GET (ETag / Last-Modified) для лент и страниц постов.
+
+Валидаторы собираются из поколений posts.caching: сигналы меняют
+их при любых изменениях, которые видны на странице, а сама метка -
+время изменения в наносекундах. Поэтому для ответа 304 не нужны ни
+запрос ленты, ни рендер, только чтение меток из кэша.
+"""
+import hashlib
+from datetime import datetime, timezone
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.views.decorators.http import condition
+
+from .caching import (AUTHOR_KEY, CARDS_KEY, INDEX_KEY, THREAD_KEY,
+                      generations, viewer_generation)
+from .models import Post
+
+User = get_user_model()
+
+POST_AUTHOR_KEY = 'post_author:{}'
+
+
+def feed_keys(request, **kwargs):
+    return [INDEX_KEY, CARDS_KEY]
+
+
+def profile_keys(request, username):
+    author_id = User.objects.filter(
+        username=username).values_list('pk', flat=True).first()
+    if author_id is None:
+        return None
+    return [CARDS_KEY, AUTHOR_KEY.format(author_id)]
+
+
+def post_keys(request, post_id):
+    # Счетчик постов автора выводится рядом с постом. Автор поста
+    # не меняется, поэтому он запоминается навсегда; после удаления
+    # поста его поколение сменится, и view ответит 404
+    key = POST_AUTHOR_KEY.format(post_id)
+    author_id = cache.get(key)
+    if author_id is None:
+        author_id = Post.objects.filter(
+            pk=post_id).values_list('author_id', flat=True).first()
+        if author_id is None:
+            return None
+        cache.set(key, author_id, None)
+    return [CARDS_KEY, THREAD_KEY.format(post_id),
+            AUTHOR_KEY.format(author_id)]
+
+
+def _tokens(keys_func, request, kwargs):
+    """Метки страницы; считаются один раз на запрос."""
+    if not hasattr(request, '_page_tokens'):
+        keys = keys_func(request, **kwargs)
+        request._page_tokens = None if keys is None else generations(keys)
+    return request._page_tokens
+
+
+def changed_at(request):
+    """
+    Время последнего изменения страницы по меткам, посчитанным
+    conditional(); None, если страницы нет или меток не считали.
+    """
+    tokens = getattr(request, '_page_tokens', None)
+    return max(int(token) for token in tokens) if tokens else None
+
+
+def conditional(keys_func):
+    """
+    condition() с валидаторами из поколений keys_func(request, **kwargs).
+    Если keys_func вернул None (страницы нет), view выполняется как
+    обычно. Last-Modified не зависит от читателя, поэтому он отдается
+    только анониму; остальным хватает ETag.
+    """
+    def etag(request, **kwargs):
+        tokens = _tokens(keys_func, request, kwargs)
+        if tokens is None:
+            return None
+        marker = ':'.join([viewer_generation(request.user), *tokens])
+        return hashlib.md5(marker.encode()).hexdigest()
+
+    def last_modified(request, **kwargs):
+        tokens = _tokens(keys_func, request, kwargs)
+        if tokens is None or request.user.is_authenticated:
+            return None
+        newest = max(int(token) for token in tokens)
+        return datetime.fromtimestamp(newest / 10 ** 9, tz=timezone.utc)
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
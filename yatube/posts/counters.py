@@ -0,0 +1,130 @@
+"""
+Денормализованные счетчики постов, комментариев и подписок.
+
+Счетчики меняются атомарным UPDATE ... SET n = n + 1 из сигналов,
+то есть в той же транзакции, что и сама запись. Расхождения
+(например, после правок в обход ORM) исправляет reconcile().
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from core.sqlite import immediate
+
+from .models import Comment, Follow, Group, Post, UserCounters
+
+User = get_user_model()
+
+
+def _change(**deltas):
+    # Greatest не дает уйти в минус, если счетчик уже разошелся
+    return {field: Greatest(F(field) + delta, 0)
+            for field, delta in deltas.items()}
+
+
+def change_user(user_id, **deltas):
+    """Сдвигает счетчики пользователя, создавая строку при первом обращении."""
+    updated = UserCounters.objects.filter(
+        user_id=user_id).update(**_change(**deltas))
+    if not updated:
+        UserCounters.objects.bulk_create(
+            [UserCounters(user_id=user_id)], ignore_conflicts=True)
+        UserCounters.objects.filter(
+            user_id=user_id).update(**_change(**deltas))
+
+
+def change_group(group_id, delta):
+    if group_id is not None:
+        Group.objects.filter(pk=group_id).update(
+            **_change(posts_count=delta))
+
+
+def change_post(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        **_change(comments_count=delta))
+
+
+def _grouped_counts(queryset, field, ids):
+    return dict(
+        queryset.filter(**{f'{field}__in': ids})
+        .values_list(field)
+        .annotate(total=Count('pk'))
+        .order_by()
+    )
+
+
+def _batches(queryset, batch_size):
+    """Первичные ключи таблицы пачками по возрастанию."""
+    last_pk = None
+    while True:
+        page = queryset.order_by('pk')
+        if last_pk is not None:
+            page = page.filter(pk__gt=last_pk)
+        ids = list(page.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return
+        yield ids
+        last_pk = ids[-1]
+
+
+def recount_users(ids):
+    """Пересчитывает счетчики пользователей ids; возвращает число правок."""
+    with immediate():
+        posts = _grouped_counts(Post.objects, 'author_id', ids)
+        followers = _grouped_counts(Follow.objects, 'author_id', ids)
+        following = _grouped_counts(Follow.objects, 'user_id', ids)
+        existing = UserCounters.objects.select_for_update().in_bulk(ids)
+        drifted = []
+        for pk in ids:
+            counters = existing.get(pk) or UserCounters(user_id=pk)
+            actual = (posts.get(pk, 0), followers.get(pk, 0),
+                      following.get(pk, 0))
+            if pk in existing and actual == (
+                    counters.posts_count, counters.followers_count,
+                    counters.following_count):
+                continue
+            (counters.posts_count, counters.followers_count,
+             counters.following_count) = actual
+            drifted.append(counters)
+        UserCounters.objects.bulk_create(
+            [c for c in drifted if c.pk not in existing])
+        UserCounters.objects.bulk_update(
+            [c for c in drifted if c.pk in existing],
+            ['posts_count', 'followers_count', 'following_count'])
+    return len(drifted)
+
+
+def _recount_column(model, column, queryset, field, ids):
+    with immediate():
+        actual = _grouped_counts(queryset, field, ids)
+        drifted = []
+        for obj in model.objects.select_for_update().filter(
+                pk__in=ids).only('pk', column):
+            value = actual.get(obj.pk, 0)
+            if getattr(obj, column) != value:
+                setattr(obj, column, value)
+                drifted.append(obj)
+        model.objects.bulk_update(drifted, [column])
+    return len(drifted)
+
+
+def recount_posts(ids):
+    return _recount_column(
+        Post, 'comments_count', Comment.objects, 'post_id', ids)
+
+
+def recount_groups(ids):
+    return _recount_column(
+        Group, 'posts_count', Post.objects, 'group_id', ids)
+
+
+def reconcile(batch_size=1000):
+    """Пересчитывает все счетчики пачками; возвращает число исправлений."""
+    return {
+        'users': sum(map(
+            recount_users, _batches(User.objects.all(), batch_size))),
+        'posts': sum(map(
+            recount_posts, _batches(Post.objects.all(), batch_size))),
+        'groups': sum(map(
+            recount_groups, _batches(Group.objects.all(), batch_size))),
+    }
@@ -0,0 +1,117 @@
+"""
+Потоковая выгрузка постов, комментариев, подписок и групп.
+
+Строки читаются пачками по возрастанию pk (WHERE pk > последний
+LIMIT n), поэтому память не зависит от объема таблицы, а выгрузку
+можно продолжить с последнего pk из контрольной точки.
+"""
+import csv
+import io
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Comment, Follow, Group, Post
+
+FORMATS = ('ndjson', 'csv')
+
+# Поля выгрузки: имя колонки -> атрибут через точку
+FIELDS = {
+    'groups': {
+        'id': 'pk', 'slug': 'slug', 'title': 'title',
+        'description': 'description', 'posts_count': 'posts_count',
+    },
+    'posts': {
+        'id': 'pk', 'pub_date': 'pub_date', 'author': 'author.username',
+        'group': 'group.slug', 'text': 'text', 'image': 'image.name',
+        'comments_count': 'comments_count',
+    },
+    'comments': {
+        'id': 'pk', 'post_id': 'post_id', 'created': 'created',
+        'author': 'author.username', 'text': 'text',
+    },
+    'follows': {
+        'id': 'pk', 'user': 'user.username', 'author': 'author.username',
+    },
+}
+KINDS = tuple(FIELDS)
+
+
+def queryset(kind, since=None, until=None, group=None):
+    """Записи вида kind с фильтрами по дате и slug группы."""
+    if kind == 'groups':
+        groups = Group.objects.all()
+        return groups.filter(slug=group) if group else groups
+    if kind == 'follows':
+        return Follow.objects.select_related('user', 'author').only(
+            'user', 'author', 'user__username', 'author__username')
+    if kind == 'posts':
+        posts = Post.objects.select_related('author', 'group').only(
+            'pub_date', 'text', 'image', 'comments_count',
+            'author', 'author__username', 'group', 'group__slug')
+        date, prefix = 'pub_date', ''
+    else:
+        posts = Comment.objects.select_related('author').only(
+            'post', 'created', 'text', 'author', 'author__username')
+        date, prefix = 'created', 'post__'
+    if since:
+        posts = posts.filter(**{f'{date}__gte': since})
+    if until:
+        posts = posts.filter(**{f'{date}__lt': until})
+    if group:
+        posts = posts.filter(**{f'{prefix}group__slug': group})
+    return posts
+
+
+def _value(obj, path):
+    for name in path.split('.'):
+        obj = getattr(obj, name, None)
+        if obj is None:
+            return None
+    return obj
+
+
+def chunks(kind, records, after=0, chunk_size=1000):
+    """Пачки словарей-строк; последний pk пачки - контрольная точка."""
+    fields = FIELDS[kind]
+    records = records.order_by('pk')
+    while True:
+        chunk = list(records.filter(pk__gt=after)[:chunk_size])
+        if not chunk:
+            return
+        yield [{name: _value(obj, path) for name, path in fields.items()}
+               for obj in chunk]
+        after = chunk[-1].pk
+
+
+def ndjson_lines(kind, rows):
+    for row in rows:
+        yield json.dumps({'type': kind, **row}, cls=DjangoJSONEncoder,
+                         ensure_ascii=False) + '\n'
+
+
+def _drain(buffer):
+    value = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return value
+
+
+def csv_lines(kind, rows, header=True):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(FIELDS[kind]))
+    if header:
+        writer.writeheader()
+        yield _drain(buffer)
+    for row in rows:
+        writer.writerow({
+            name: value.isoformat() if hasattr(value, 'isoformat') else value
+            for name, value in row.items()})
+        yield _drain(buffer)
+
+
+def lines(kind, rows, fmt, header=True):
+    """Строки файла выгрузки в формате fmt."""
+    if fmt == 'csv':
+        return csv_lines(kind, rows, header)
+    return ndjson_lines(kind, rows)
@@ -0,0 +1,247 @@
+"""
+Лента подписок: гибрид доставки при записи и при чтении.
+
+Посты обычных авторов сразу раскладываются по лентам подписчиков
+(fan-out on write), поэтому страница /follow/ читается диапазоном
+по индексу (user, pub_date) вместо join Post x Follow.
+Авторы, у которых подписчиков не меньше FEED_CELEBRITY_THRESHOLD,
+в ленты не пишутся: их недавние посты подмешиваются при чтении
+слиянием через кучу.
+"""
+import heapq
+from collections import defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+
+from .models import Follow, Post, TimelineEntry, UserCounters
+
+RECENT_POSTS_KEY = 'feed:recent:{}'
+
+
+def _entry(user_id, post_id, author_id, pub_date):
+    return TimelineEntry(
+        user_id=user_id,
+        post_id=post_id,
+        author_id=author_id,
+        pub_date=pub_date,
+    )
+
+
+def _bulk_insert(entries):
+    """Пишет записи ленты пачками, не собирая их все в памяти."""
+    batch_size = settings.TIMELINE_BATCH_SIZE
+    while True:
+        batch = list(islice(entries, batch_size))
+        if not batch:
+            return
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def followers_counts(author_ids):
+    """Число подписчиков авторов по денормализованным счетчикам."""
+    counts = dict.fromkeys(author_ids, 0)
+    counts.update(
+        UserCounters.objects.filter(user_id__in=author_ids)
+        .values_list('user_id', 'followers_count')
+    )
+    return counts
+
+
+def is_celebrity(author_id):
+    """Автор слишком популярен для доставки при записи."""
+    return (followers_counts([author_id])[author_id]
+            >= settings.FEED_CELEBRITY_THRESHOLD)
+
+
+def recent_posts(author_id):
+    """
+    Недавние посты автора: список (pub_date, id), новые первыми.
+    Длина ограничена FEED_RECENT_POSTS, история целиком не читается.
+    """
+    key = RECENT_POSTS_KEY.format(author_id)
+    posts = cache.get(key)
+    if posts is None:
+        posts = list(
+            Post.objects.filter(author_id=author_id)
+            .order_by('-pub_date', '-pk')
+            .values_list('pub_date', 'pk')[:settings.FEED_RECENT_POSTS]
+        )
+        cache.set(key, posts)
+    return posts
+
+
+def forget_recent_posts(author_id):
+    cache.delete(RECENT_POSTS_KEY.format(author_id))
+
+
+def _delivered_authors(author_ids):
+    """Авторы, посты которых доставляются при записи."""
+    return {pk for pk, count in followers_counts(author_ids).items()
+            if count < settings.FEED_CELEBRITY_THRESHOLD}
+
+
+def push_posts(posts):
+    """Доставляет новые посты в ленты всех подписчиков их авторов."""
+    authors = _delivered_authors({post.author_id for post in posts})
+    if not authors:
+        return
+    by_author = defaultdict(list)
+    for post in posts:
+        if post.author_id in authors:
+            by_author[post.author_id].append(post)
+    follows = Follow.objects.filter(
+        author_id__in=authors).values_list('user_id', 'author_id')
+    _bulk_insert(
+        _entry(user_id, post.pk, author_id, post.pub_date)
+        for user_id, author_id in follows.iterator()
+        for post in by_author[author_id])
+
+
+def push_post(post):
+    push_posts([post])
+
+
+def backfill_many(pairs):
+    """
+    Добавляет в ленты читателей уже опубликованные посты авторов.
+    pairs - пары (user_id, author_id).
+    """
+    authors = _delivered_authors({author_id for _, author_id in pairs})
+    readers = defaultdict(list)
+    for user_id, author_id in pairs:
+        if author_id in authors:
+            readers[author_id].append(user_id)
+    if not readers:
+        return
+    posts = Post.objects.filter(
+        author_id__in=readers).values_list('pk', 'author_id', 'pub_date')
+    _bulk_insert(
+        _entry(user_id, post_id, author_id, pub_date)
+        for post_id, author_id, pub_date in posts.iterator()
+        for user_id in readers[author_id])
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту читателя уже опубликованные посты автора."""
+    backfill_many([(user_id, author_id)])
+
+
+def demote(author_id):
+    """
+    Если после отписки автор опустился ниже порога популярности,
+    досылает его посты в ленты всех подписчиков: пока он был
+    популярным, посты и подписки в ленты не писались. Возвращает
+    id подписчиков, чьи ленты изменились, или None, если автор
+    порог не пересек.
+    """
+    count = followers_counts([author_id])[author_id]
+    if count != settings.FEED_CELEBRITY_THRESHOLD - 1:
+        return None
+    pairs = list(Follow.objects.filter(
+        author_id=author_id).values_list('user_id', 'author_id'))
+    backfill_many(pairs)
+    return [user_id for user_id, _ in pairs]
+
+
+def purge(user_id, author_id):
+    """Убирает посты автора из ленты отписавшегося читателя."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild(user_ids=None):
+    """Пересобирает ленты заново по таблице подписок."""
+    follows = Follow.objects.all()
+    entries = TimelineEntry.objects.all()
+    if user_ids is not None:
+        follows = follows.filter(user_id__in=user_ids)
+        entries = entries.filter(user_id__in=user_ids)
+    entries.delete()
+    pairs = follows.values_list('user_id', 'author_id').iterator()
+    count = 0
+    while True:
+        batch = list(islice(pairs, settings.TIMELINE_BATCH_SIZE))
+        if not batch:
+            return count
+        backfill_many(batch)
+        count += len(batch)
+
+
+def _posts(posts=None):
+    if posts is None:
+        posts = Post.objects.all()
+    return posts.select_related('author', 'group')
+
+
+def timeline_posts(user, posts=None):
+    """
+    Посты ленты подписок читателя в порядке публикации.
+    posts - базовый QuerySet постов (например, с аннотациями).
+    Сортировка по колонкам индекса ленты, а не по posts_post.id:
+    иначе SQLite досортировывает каждую страницу во временном B-дереве.
+    Колонки взяты аннотациями, чтобы курсор (posts.utils) сравнивал
+    их в том же join, а не в новом.
+    """
+    return _posts(posts).filter(
+        timeline_entries__user=user
+    ).annotate(
+        timeline_date=F('timeline_entries__pub_date'),
+        timeline_post=F('timeline_entries__post_id'),
+    ).order_by('-timeline_date', '-timeline_post')
+
+
+class FollowFeed:
+    """
+    Лента подписок со слиянием при чтении.
+    Поддерживает count() и срезы, поэтому подходит для Paginator:
+    для среза [start:stop] из каждого источника берется не больше
+    stop записей, а heapq.merge отдает их в порядке pub_date.
+    """
+
+    def __init__(self, user, celebrity_ids, posts=None):
+        self.celebrity_ids = celebrity_ids
+        self.posts = _posts(posts)
+        self.timeline = TimelineEntry.objects.filter(user=user).exclude(
+            author_id__in=celebrity_ids).order_by('-pub_date', '-post_id')
+
+    def count(self):
+        return self.timeline.count() + sum(
+            len(recent_posts(pk)) for pk in self.celebrity_ids)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        sources = [
+            self.timeline.values_list('pub_date', 'post_id')[:stop]]
+        sources += [
+            recent_posts(pk)[:stop] for pk in self.celebrity_ids]
+        keys = list(islice(
+            heapq.merge(*sources, reverse=True), start, stop))
+        posts = self.posts.in_bulk([pk for _, pk in keys])
+        return [posts[pk] for _, pk in keys if pk in posts]
+
+
+def celebrity_authors(user):
+    """Популярные авторы среди подписок читателя."""
+    return list(UserCounters.objects.filter(
+        user__following__user=user,
+        followers_count__gte=settings.FEED_CELEBRITY_THRESHOLD,
+    ).values_list('user_id', flat=True))
+
+
+def follow_feed(user, celebrity_ids=None, posts=None):
+    """
+    Лента подписок читателя. Если среди авторов нет популярных,
+    это обычный QuerySet по материализованной ленте.
+    """
+    if celebrity_ids is None:
+        celebrity_ids = celebrity_authors(user)
+    if not celebrity_ids:
+        return timeline_posts(user, posts)
+    return FollowFeed(user, celebrity_ids, posts)
@@ -0,0 +1,62 @@
+"""
+Персональные фрагменты страниц из кэша (core.pagecache).
+
+Дыра задается строкой 'имя:аргумент:...', как в метке {% hole %}.
+На страницу уходит не больше двух запросов: авторы кнопок подписки
+и подписки читателя среди авторов карточек.
+"""
+from django.contrib.auth import get_user_model
+from django.template.loader import render_to_string
+
+from . import viewer
+from .forms import CommentForm
+from .models import Follow, Post
+
+User = get_user_model()
+
+
+def _ids(parsed, name):
+    return {int(args[0]) for hole_name, *args in parsed
+            if hole_name == name and args and args[0].isdigit()}
+
+
+def render(request, holes):
+    """HTML дыр для читателя запроса; неизвестные дыры пусты."""
+    parsed = [hole.split(':') for hole in holes]
+    user = request.user
+    badge_ids = _ids(parsed, 'badge')
+    followed = set()
+    if badge_ids and user.is_authenticated:
+        followed = set(Follow.objects.filter(
+            user=user, author_id__in=badge_ids,
+        ).values_list('author_id', flat=True))
+    authors = {}
+    follow_ids = _ids(parsed, 'follow')
+    if follow_ids:
+        authors = viewer.authors(
+            user, User.objects.filter(pk__in=follow_ids)).in_bulk()
+    fragments = {}
+    for hole, (name, *args) in zip(holes, parsed):
+        if not all(arg.isdigit() for arg in args):
+            continue
+        args = [int(arg) for arg in args]
+        if name == 'header':
+            template, context = 'includes/header.html', {}
+        elif name == 'switcher':
+            template, context = 'posts/includes/switcher.html', {}
+        elif name == 'badge' and len(args) == 1:
+            template = 'posts/includes/follow_badge.html'
+            context = {'followed': args[0] in followed}
+        elif name == 'follow' and len(args) == 1 and args[0] in authors:
+            author = authors[args[0]]
+            template = 'posts/includes/follow_button.html'
+            context = {'author': author,
+                       'following': author.is_followed_by_viewer}
+        elif name == 'post_actions' and len(args) == 2:
+            template = 'posts/includes/post_actions.html'
+            context = {'post': Post(pk=args[0], author_id=args[1]),
+                       'form': CommentForm()}
+        else:
+            continue
+        fragments[hole] = render_to_string(template, context, request)
+    return fragments
@@ -0,0 +1,364 @@
+"""
+Массовая загрузка групп, постов, комментариев и подписок из NDJSON
+в формате выгрузки posts.export.
+
+Строки читаются потоком и обрабатываются пачками. Авторы и группы
+пачки ищутся одним запросом, записи проверяются clean_fields() без
+обращений к БД и пишутся bulk_create в одной транзакции на пачку.
+Сигналы при этом не срабатывают, поэтому счетчики, ленты подписок
+и кэши обновляются сразу для всей пачки. Поисковый индекс FTS5
+ведут триггеры SQLite, им bulk_create не помеха.
+"""
+import json
+import os
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import DatabaseError, models
+from django.utils import timezone
+
+from core.sqlite import immediate
+
+from . import caching, counters, feed, thumbnails
+from .export import KINDS
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+def batches(lines, batch_size):
+    """Пачки непустых строк с их номерами в файле (с единицы)."""
+    numbered = ((number, line) for number, line in enumerate(lines, 1)
+                if line.strip())
+    while True:
+        batch = list(islice(numbered, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _describe(error):
+    if hasattr(error, 'error_dict'):
+        return '; '.join(f'{field}: {" ".join(messages)}'
+                         for field, messages in error.message_dict.items())
+    return ' '.join(error.messages)
+
+
+def _aware(value):
+    if value is None:
+        return timezone.now()
+    return timezone.make_aware(value) if timezone.is_naive(value) else value
+
+
+def _parse(line):
+    try:
+        row = json.loads(line)
+    except ValueError as error:
+        raise ValidationError(f'не JSON: {error}')
+    if not isinstance(row, dict) or row.get('type') not in KINDS:
+        raise ValidationError('неизвестный тип записи')
+    return row
+
+
+def _build(row):
+    kind = row['type']
+    try:
+        if kind == 'groups':
+            return Group(slug=row['slug'], title=row['title'],
+                         description=row.get('description') or '')
+        if kind == 'posts':
+            return Post(text=row['text'], pub_date=row.get('pub_date'),
+                        image=row.get('image') or '')
+        if kind == 'comments':
+            return Comment(text=row['text'], created=row.get('created'))
+        return Follow()
+    except KeyError as error:
+        raise ValidationError(f'нет поля {error}')
+
+
+def _clean(obj, exclude):
+    obj.clean_fields(exclude=exclude)
+    # У TextField max_length проверяет только форма
+    for field in obj._meta.concrete_fields:
+        if isinstance(field, models.TextField) and field.max_length:
+            if len(getattr(obj, field.attname)) > field.max_length:
+                raise ValidationError({field.name: [
+                    f'длиннее {field.max_length} символов']})
+
+
+def _bulk_create(model, objects):
+    """
+    bulk_create, после которого у объектов есть pk. На SQLite
+    Django 2.2 их не возвращает, поэтому новые id читаются по
+    возрастанию после прежнего максимума.
+    """
+    last_pk = model.objects.order_by(
+        '-pk').values_list('pk', flat=True).first()
+    model.objects.bulk_create(objects)
+    if not objects or objects[0].pk is not None:
+        return
+    ids = list(model.objects.filter(pk__gt=last_pk or 0).order_by(
+        'pk').values_list('pk', flat=True))
+    if len(ids) != len(objects):
+        raise DatabaseError('Таблицу одновременно пишет кто-то еще')
+    for obj, pk in zip(objects, ids):
+        obj.pk = pk
+
+
+def _create_dated(model, objects, fields):
+    """
+    _bulk_create с датами из файла. auto_now_add ставит полям fields
+    текущее время, поэтому даты возвращаются следующим UPDATE: выключать
+    auto_now_add нельзя, поле модели общее для всех потоков процесса.
+    """
+    dates = [[getattr(obj, field) for field in fields] for obj in objects]
+    _bulk_create(model, objects)
+    for obj, values in zip(objects, dates):
+        for field, value in zip(fields, values):
+            setattr(obj, field, value)
+    model.objects.bulk_update(objects, fields)
+
+
+class Importer:
+    """
+    Загрузчик помнит найденных авторов и группы, а также соответствие
+    id постов из файла новым id: комментарии из следующих пачек
+    находят свои посты без запросов.
+    """
+
+    def __init__(self, images_dir=None, create_users=False):
+        self.images_dir = images_dir
+        self.create_users = create_users
+        self.users = {}
+        self.groups = {}
+        self.posts = {}
+        self.new_users = set()
+        self.batch_groups = set()
+        self.batch_posts = set()
+        self.created = dict.fromkeys(('users', *KINDS), 0)
+
+    def prepare(self, batch):
+        """
+        Разбирает и проверяет пачку строк (номер, строка).
+        Возвращает проверенные записи по видам - пары (строка, объект) -
+        и ошибки - пары (номер, текст).
+        """
+        records = {kind: [] for kind in KINDS}
+        errors = []
+        for number, line in batch:
+            try:
+                row = _parse(line)
+                records[row['type']].append((number, row, _build(row)))
+            except ValidationError as error:
+                errors.append((number, _describe(error)))
+        self._lookup(records)
+        self.new_users = set()
+        self.batch_groups = set()
+        self.batch_posts = set()
+        valid = {kind: [] for kind in KINDS}
+        for kind in KINDS:
+            check = getattr(self, f'_check_{kind}')
+            for number, row, obj in records[kind]:
+                try:
+                    check(row, obj)
+                except ValidationError as error:
+                    errors.append((number, _describe(error)))
+                except TypeError:
+                    errors.append((number, 'неверный тип поля'))
+                else:
+                    valid[kind].append((row, obj))
+        return valid, sorted(errors)
+
+    def _lookup(self, records):
+        names, slugs = set(), set()
+        for kind, fields in (('posts', ('author',)),
+                             ('comments', ('author',)),
+                             ('follows', ('user', 'author'))):
+            for _, row, _ in records[kind]:
+                names.update(row.get(field) for field in fields
+                             if isinstance(row.get(field), str))
+        slugs.update(row['group'] for _, row, _ in records['posts']
+                     if isinstance(row.get('group'), str))
+        slugs.update(obj.slug for _, _, obj in records['groups']
+                     if isinstance(obj.slug, str))
+        names -= self.users.keys()
+        slugs -= self.groups.keys()
+        if names:
+            self.users.update(User.objects.filter(
+                username__in=names).values_list('username', 'pk'))
+        if slugs:
+            self.groups.update(Group.objects.filter(
+                slug__in=slugs).values_list('slug', 'pk'))
+
+    def _user(self, row, field):
+        name = row.get(field)
+        if not isinstance(name, str):
+            raise ValidationError({field: ['нужно имя пользователя']})
+        if name in self.users or name in self.new_users:
+            return
+        if not self.create_users:
+            raise ValidationError({field: [f'нет пользователя {name}']})
+        username = User._meta.get_field('username')
+        try:
+            username.run_validators(name)
+        except ValidationError as error:
+            raise ValidationError({field: error.messages})
+        self.new_users.add(name)
+
+    def _check_groups(self, row, obj):
+        # Описание в базе бывает пустым, хоть в форме оно обязательно
+        _clean(obj, exclude=['description'])
+        self.batch_groups.add(obj.slug)
+
+    def _check_posts(self, row, obj):
+        self._user(row, 'author')
+        slug = row.get('group')
+        if slug is not None and slug not in self.groups and (
+                slug not in self.batch_groups):
+            raise ValidationError({'group': [f'нет группы {slug}']})
+        _clean(obj, exclude=['author', 'group'])
+        obj.pub_date = _aware(obj.pub_date)
+        name = obj.image.name
+        if self.images_dir and name:
+            path = os.path.normpath(name)
+            if os.path.isabs(path) or path.startswith('..') or not (
+                    os.path.isfile(os.path.join(self.images_dir, path))):
+                raise ValidationError({'image': [f'нет файла {name}']})
+        self.batch_posts.add(row.get('id'))
+
+    def _check_comments(self, row, obj):
+        self._user(row, 'author')
+        post_id = row.get('post_id')
+        if post_id is None or (post_id not in self.posts
+                               and post_id not in self.batch_posts):
+            raise ValidationError({'post_id': [f'нет поста {post_id}']})
+        _clean(obj, exclude=['post', 'author'])
+        obj.created = _aware(obj.created)
+
+    def _check_follows(self, row, obj):
+        self._user(row, 'user')
+        self._user(row, 'author')
+        if row['user'] == row['author']:
+            raise ValidationError('подписка на самого себя')
+
+    def write(self, records):
+        """
+        Пишет проверенную пачку одной транзакцией, затем сбрасывает
+        кэши страниц и ставит картинки в очередь на миниатюры.
+        """
+        copied = self._copy_images(records['posts'])
+        try:
+            self._write(records)
+        except BaseException:
+            # Откаченная пачка не оставляет файлов в хранилище
+            for name in copied:
+                default_storage.delete(name)
+            raise
+        for _, post in records['posts']:
+            if post.image.name:
+                thumbnails.enqueue(post.image.name)
+
+    def _write(self, records):
+        with immediate():
+            self._create_users()
+            self._create_groups(records['groups'])
+            posts = self._create_posts(records['posts'])
+            comments = self._create_comments(records['comments'])
+            follows = self._create_follows(records['follows'])
+            counters.recount_users(list(
+                {post.author_id for post in posts}
+                | {pk for pair in follows for pk in pair}))
+            counters.recount_groups(list(
+                {post.group_id for post in posts} - {None}))
+            counters.recount_posts(list(
+                {comment.post_id for comment in comments}))
+            feed.push_posts(posts)
+            feed.backfill_many(follows)
+        if posts or comments or follows:
+            for author_id in {post.author_id for post in posts}:
+                feed.forget_recent_posts(author_id)
+            caching.bump_follow({user_id for user_id, _ in follows})
+            if follows:
+                # Авторы могли перейти порог популярности
+                caching.bump_celebrities()
+            caching.bump_cards()
+
+    def _copy_images(self, records):
+        """Копирует картинки из images_dir; возвращает новые имена."""
+        copied = []
+        if not self.images_dir:
+            return copied
+        try:
+            for _, post in records:
+                name = post.image.name
+                if not name:
+                    continue
+                path = os.path.join(self.images_dir, os.path.normpath(name))
+                with open(path, 'rb') as file:
+                    post.image.name = default_storage.save(name, File(file))
+                copied.append(post.image.name)
+        except BaseException:
+            for name in copied:
+                default_storage.delete(name)
+            raise
+        return copied
+
+    def _create_users(self):
+        if not self.new_users:
+            return
+        User.objects.bulk_create([
+            User(username=name, password=make_password(None))
+            for name in self.new_users])
+        self.users.update(User.objects.filter(
+            username__in=self.new_users).values_list('username', 'pk'))
+        self.created['users'] += len(self.new_users)
+
+    def _create_groups(self, records):
+        groups = {group.slug: group for _, group in records
+                  if group.slug not in self.groups}
+        Group.objects.bulk_create(groups.values())
+        self.groups.update(Group.objects.filter(
+            slug__in=list(groups)).values_list('slug', 'pk'))
+        self.created['groups'] += len(groups)
+
+    def _create_posts(self, records):
+        posts = []
+        for row, post in records:
+            post.author_id = self.users[row['author']]
+            post.group_id = self.groups.get(row.get('group'))
+            post.created = post.pub_date
+            posts.append(post)
+        _create_dated(Post, posts, ['pub_date', 'created'])
+        for (row, _), post in zip(records, posts):
+            if row.get('id') is not None:
+                self.posts[row['id']] = post.pk
+        self.created['posts'] += len(posts)
+        return posts
+
+    def _create_comments(self, records):
+        comments = []
+        for row, comment in records:
+            comment.post_id = self.posts[row['post_id']]
+            comment.author_id = self.users[row['author']]
+            comments.append(comment)
+        _create_dated(Comment, comments, ['created'])
+        self.created['comments'] += len(comments)
+        return comments
+
+    def _create_follows(self, records):
+        pairs = {(self.users[row['user']], self.users[row['author']])
+                 for row, _ in records}
+        existing = set(Follow.objects.filter(
+            user_id__in={user_id for user_id, _ in pairs},
+            author_id__in={author_id for _, author_id in pairs},
+        ).values_list('user_id', 'author_id')) if pairs else set()
+        follows = sorted(pairs - existing)
+        Follow.objects.bulk_create([
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id, author_id in follows])
+        self.created['follows'] += len(follows)
+        return follows
@@ -0,0 +1,126 @@
+import argparse
+import datetime
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from posts import export
+
+
+def moment(value):
+    """Дата или дата-время ISO 8601; без зоны - в TIME_ZONE."""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise argparse.ArgumentTypeError(f'не дата: {value}')
+        parsed = datetime.datetime.combine(day, datetime.time())
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class Command(BaseCommand):
+    help = ('Потоково выгружает посты, комментарии, подписки и группы '
+            'в NDJSON или CSV')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'kinds', nargs='*', metavar='kind',
+            help=f'что выгружать: {", ".join(export.KINDS)} '
+                 '(по умолчанию все)',
+        )
+        parser.add_argument(
+            '--format', choices=export.FORMATS, default='ndjson')
+        parser.add_argument(
+            '--output', help='файл выгрузки (по умолчанию stdout)')
+        parser.add_argument(
+            '--since', type=moment,
+            help='с этой даты включительно (посты и комментарии)',
+        )
+        parser.add_argument(
+            '--until', type=moment, help='до этой даты, не включая')
+        parser.add_argument('--group', help='slug группы')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument(
+            '--checkpoint',
+            help='JSON с позицией выгрузки: если он есть, выгрузка '
+                 'продолжается с места остановки',
+        )
+
+    def handle(self, *args, **options):
+        kinds = options['kinds'] or list(export.KINDS)
+        unknown = set(kinds) - set(export.KINDS)
+        if unknown:
+            raise CommandError(f'Неизвестные виды: {", ".join(unknown)}')
+        fmt = options['format']
+        if fmt == 'csv' and len(kinds) != 1:
+            raise CommandError('В CSV выгружается один вид записей')
+        if options['checkpoint'] and not options['output']:
+            raise CommandError('Для --checkpoint нужен --output')
+        # Продолжить можно только выгрузку с теми же параметрами
+        params = {
+            'kinds': kinds, 'format': fmt, 'group': options['group'],
+            'since': options['since'] and options['since'].isoformat(),
+            'until': options['until'] and options['until'].isoformat(),
+        }
+        state = self.load_checkpoint(options['checkpoint'], params)
+        if options['output']:
+            mode = 'r+' if state['offset'] else 'w'
+            output = open(options['output'], mode, encoding='utf-8',
+                          newline='')
+            # Строки после последней контрольной точки пишутся заново
+            output.seek(state['offset'])
+            output.truncate()
+        else:
+            output = self.stdout
+        try:
+            for kind in kinds:
+                if kind in state['done']:
+                    continue
+                self.export(kind, output, state, options)
+                state['done'].append(kind)
+                self.save_checkpoint(options['checkpoint'], state, output)
+        finally:
+            if output is not self.stdout:
+                output.close()
+        if options['output']:
+            self.stdout.write(self.style.SUCCESS(
+                f'Выгружено в {options["output"]}'))
+
+    def export(self, kind, output, state, options):
+        fmt = options['format']
+        after = state['after'].get(kind, 0)
+        if fmt == 'csv' and not after:
+            output.writelines(export.lines(kind, [], fmt))
+        records = export.queryset(
+            kind, options['since'], options['until'], options['group'])
+        for rows in export.chunks(
+                kind, records, after, options['chunk_size']):
+            output.writelines(export.lines(kind, rows, fmt, header=False))
+            state['after'][kind] = rows[-1]['id']
+            self.save_checkpoint(options['checkpoint'], state, output)
+
+    def load_checkpoint(self, path, params):
+        state = {'params': params, 'after': {}, 'done': [], 'offset': 0}
+        if not path or not os.path.exists(path):
+            return state
+        with open(path) as file:
+            saved = json.load(file)
+        if saved['params'] != params:
+            raise CommandError(
+                'Контрольная точка записана для других параметров выгрузки')
+        return saved
+
+    def save_checkpoint(self, path, state, output):
+        output.flush()
+        if not path:
+            return
+        state['offset'] = output.tell()
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump(state, file)
+        os.replace(tmp_path, path)
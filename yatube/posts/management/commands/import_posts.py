@@ -0,0 +1,60 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import importer
+
+
+class Command(BaseCommand):
+    help = ('Загружает группы, посты, комментарии и подписки из NDJSON '
+            '(формат export_posts) пачками через bulk_create')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'input', help='файл NDJSON; "-" - читать из stdin')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--images-dir',
+            help='каталог с картинками постов: файлы копируются '
+                 'в хранилище под именами из поля image',
+        )
+        parser.add_argument(
+            '--create-users', action='store_true',
+            help='создавать недостающих авторов без пароля',
+        )
+        parser.add_argument(
+            '--skip-invalid', action='store_true',
+            help='пропускать ошибочные строки вместо остановки',
+        )
+
+    def handle(self, *args, **options):
+        loader = importer.Importer(
+            images_dir=options['images_dir'],
+            create_users=options['create_users'],
+        )
+        if options['input'] == '-':
+            source = sys.stdin
+        else:
+            source = open(options['input'], encoding='utf-8')
+        skipped = 0
+        try:
+            for batch in importer.batches(source, options['batch_size']):
+                records, errors = loader.prepare(batch)
+                for number, message in errors:
+                    self.stderr.write(f'Строка {number}: {message}')
+                if errors and not options['skip_invalid']:
+                    raise CommandError(
+                        f'Ошибки в строках {errors[0][0]}-{batch[-1][0]}, '
+                        f'загружено до строки {batch[0][0]}: '
+                        f'{self.summary(loader)}')
+                skipped += len(errors)
+                loader.write(records)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено: {self.summary(loader)}; пропущено строк: {skipped}'))
+
+    def summary(self, loader):
+        return ', '.join(
+            f'{kind} {count}' for kind, count in loader.created.items())
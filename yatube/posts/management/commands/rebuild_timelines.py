@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from core.sqlite import immediate
+from posts import feed
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает материализованные ленты подписок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help='id читателя; можно указать несколько раз',
+        )
+
+    def handle(self, *args, **options):
+        with immediate():
+            follows = feed.rebuild(options['user_ids'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Ленты пересобраны, подписок обработано: {follows}'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счетчики и исправляет расхождения'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='сколько строк пересчитывать в одной транзакции',
+        )
+
+    def handle(self, *args, **options):
+        fixed = counters.reconcile(options['batch_size'])
+        for table, count in fixed.items():
+            self.stdout.write(f'{table}: исправлено {count}')
+        self.stdout.write(self.style.SUCCESS('Счетчики сверены'))
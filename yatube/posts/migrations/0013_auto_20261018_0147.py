@@ -0,0 +1,70 @@
+# Generated by Django 2.2.16 on 2026-10-18 01:47
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def _counts(queryset, field):
+    return dict(queryset.values_list(field).annotate(total=Count('pk'))
+                .order_by())
+
+
+def fill_counters(apps, schema_editor):
+    """Заполняет счетчики по уже существующим данным."""
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Post = apps.get_model('posts', 'Post')
+    Group = apps.get_model('posts', 'Group')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    UserCounters = apps.get_model('posts', 'UserCounters')
+    posts = _counts(Post.objects, 'author_id')
+    followers = _counts(Follow.objects, 'author_id')
+    following = _counts(Follow.objects, 'user_id')
+    UserCounters.objects.bulk_create(
+        [UserCounters(user_id=pk,
+                      posts_count=posts.get(pk, 0),
+                      followers_count=followers.get(pk, 0),
+                      following_count=following.get(pk, 0))
+         for pk in User.objects.values_list('pk', flat=True)],
+    )
+    for pk, total in _counts(Comment.objects, 'post_id').items():
+        Post.objects.filter(pk=pk).update(comments_count=total)
+    for pk, total in _counts(Post.objects, 'group_id').items():
+        Group.objects.filter(pk=pk).update(posts_count=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0012_auto_20261018_0145'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserCounters',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counters', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('posts_count', models.PositiveIntegerField(default=0)),
+                ('followers_count', models.PositiveIntegerField(default=0)),
+                ('following_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Счетчики пользователя',
+                'verbose_name_plural': 'Счетчики пользователей',
+            },
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -7,11 +7,37 @@ from core.models import CreatedModel
 User = get_user_model()
 
 
-class Group(models.Model):
+class CountedModel(models.Model):
+    """
+    Абстрактная модель с денормализованными полями: счетчиками
+    (posts.counters) и версиями. Их меняет только UPDATE с F(), поэтому
+    обычный save() существующей строки их не пишет: иначе он вернул бы
+    значение, прочитанное до чужого сдвига.
+    """
+    counted_fields = ()
+
+    def save(self, force_insert=False, force_update=False, using=None,
+             update_fields=None):
+        if (update_fields is None and not force_insert
+                and not self._state.adding):
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counted_fields]
+        super().save(force_insert, force_update, using, update_fields)
+
+    class Meta:
+        abstract = True
+
+
+class Group(CountedModel):
     """Группы"""
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField()
+    posts_count = models.PositiveIntegerField(default=0, editable=False)
+
+    counted_fields = ('posts_count',)
 
     def __str__(self) -> str:
         return self.title
@@ -21,7 +47,7 @@ class Group(models.Model):
         verbose_name_plural = "Группы"
 
 
-class Post(CreatedModel):
+class Post(CountedModel, CreatedModel):
     """Посты"""
     text = models.TextField(max_length=4000, verbose_name="Текст поста")
     pub_date = models.DateTimeField(auto_now_add=True)
@@ -43,14 +69,44 @@ class Post(CreatedModel):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+    # Версия карточки поста в кэше: растет при каждом изменении
+    # самого поста, его группы или автора
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    counted_fields = ('comments_count', 'version')
 
     def __str__(self) -> str:
         return self.text[:settings.SYMBOLS_AMOUNT]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # Запоминаем группу и картинку из базы: при смене группы
+        # правятся счетчики обеих групп, новая картинка уходит
+        # на генерацию миниатюр
+        instance = super().from_db(db, field_names, values)
+        if 'group_id' in field_names:
+            instance._loaded_group_id = values[field_names.index('group_id')]
+        if 'image' in field_names:
+            instance._loaded_image = values[field_names.index('image')]
+        return instance
+
     class Meta:
         verbose_name = "Пост автора"
         verbose_name_plural = "Посты авторов"
         ordering = ['-pub_date']
+        # Индексы под keyset-пагинацию лент по (pub_date, id)
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_pub_date_id_idx'),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx'),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx'),
+        ]
 
 
 class Comment(CreatedModel):
@@ -66,6 +122,14 @@ class Comment(CreatedModel):
     )
     text = models.TextField(max_length=1000, verbose_name="Текст комментария")
 
+    class Meta:
+        # Ветка комментариев листается курсором по (created, id)
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_created_idx'),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -84,3 +148,57 @@ class Follow(models.Model):
             models.UniqueConstraint(
                 fields=['user', 'author'],
                 name='unique_following')]
+
+
+class UserCounters(models.Model):
+    """Денормализованные счетчики пользователя"""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Счетчики пользователя"
+        verbose_name_plural = "Счетчики пользователей"
+
+
+class TimelineEntry(models.Model):
+    """Материализованная лента подписок: пост, доставленный читателю"""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+    )
+    # Автор и дата копируются из поста, чтобы чтение ленты
+    # и очистка при отписке шли по индексу без join
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-pub_date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_post')]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_pub_date_idx'),
+            models.Index(
+                fields=['user', 'author'],
+                name='timeline_user_author_idx'),
+        ]
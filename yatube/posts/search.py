@@ -0,0 +1,146 @@
+"""
+Полнотекстовый поиск по Post.text через SQLite FTS5.
+
+Индекс posts_post_fts - внешняя FTS5-таблица над posts_post,
+ее синхронизируют триггеры, поэтому в индекс попадают и
+bulk_create, и queryset.update(). Результаты ранжируются по bm25
+и листаются курсором по (score, id). На других СУБД поиск
+откатывается к icontains.
+"""
+import binascii
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.encoding import force_bytes, force_str
+from django.utils.http import urlencode, urlsafe_base64_decode
+from django.utils.http import urlsafe_base64_encode
+
+from .models import Post
+from .utils import CursorPage
+
+FTS_TABLE = 'posts_post_fts'
+
+# Повторяет миграцию 0015; IF NOT EXISTS позволяет вызывать это после
+# каждой миграции: SQLite теряет триггеры при пересоздании posts_post.
+INSTALL_SQL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        text, content='posts_post', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2')""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai
+        AFTER INSERT ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad
+        AFTER DELETE ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+        AFTER UPDATE OF text ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+        END""",
+]
+REBUILD_SQL = f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+
+
+def fts_available():
+    return connection.vendor == 'sqlite'
+
+
+def install(db_connection, rebuild=False):
+    """Создает индекс и триггеры, если их нет."""
+    if db_connection.vendor != 'sqlite':
+        return
+    with db_connection.cursor() as cursor:
+        for statement in INSTALL_SQL:
+            cursor.execute(statement)
+        if rebuild:
+            cursor.execute(REBUILD_SQL)
+
+
+def match_expression(query):
+    """
+    Превращает пользовательский ввод в безопасный запрос FTS5:
+    каждое слово - фраза в кавычках, последнее ищется по префиксу.
+    """
+    words = [word.replace('"', '""') for word in query.split()]
+    if not words:
+        return ''
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def matching_ids(query):
+    """Подзапрос id постов, подходящих под запрос (для __in)."""
+    return RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        [match_expression(query)])
+
+
+def _encode(score, pk):
+    return urlsafe_base64_encode(force_bytes(f'{score!r}|{pk}'))
+
+
+def _decode(token):
+    if not token:
+        return None
+    try:
+        score, pk = force_str(urlsafe_base64_decode(token)).split('|')
+        return float(score), int(pk)
+    except (ValueError, TypeError, UnicodeDecodeError, binascii.Error):
+        return None
+
+
+def _ranked(match, per_page, after=None, before=None):
+    """Пары (score, id) одной страницы; bm25 меньше - лучше."""
+    sql = (f'SELECT bm25({FTS_TABLE}) AS score, rowid FROM {FTS_TABLE} '
+           f'WHERE {FTS_TABLE} MATCH %s')
+    params = [match]
+    if after is not None:
+        sql += ' AND (score > %s OR (score = %s AND rowid > %s))'
+        params += [after[0], after[0], after[1]]
+        sql += ' ORDER BY score, rowid'
+    elif before is not None:
+        sql += ' AND (score < %s OR (score = %s AND rowid < %s))'
+        params += [before[0], before[0], before[1]]
+        sql += ' ORDER BY score DESC, rowid DESC'
+    else:
+        sql += ' ORDER BY score, rowid'
+    sql += ' LIMIT %s'
+    params.append(per_page + 1)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def search_posts(query, per_page, after=None, before=None):
+    """Страница результатов поиска, лучшие совпадения первыми."""
+    match = match_expression(query)
+    if not match:
+        return CursorPage([])
+    if not fts_available():
+        return CursorPage(list(
+            Post.objects.select_related('author', 'group')
+            .filter(text__icontains=query)[:per_page]))
+    after = _decode(after)
+    before = _decode(before) if after is None else None
+    rows = _ranked(match, per_page, after, before)
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if before is not None:
+        rows.reverse()
+        has_next, has_previous = True, has_more
+    else:
+        has_next, has_previous = has_more, after is not None
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        [pk for _, pk in rows])
+    page = CursorPage(
+        [posts[pk] for _, pk in rows if pk in posts],
+        next_cursor=_encode(*rows[-1]) if has_next and rows else None,
+        previous_cursor=_encode(*rows[0]) if has_previous and rows else None,
+    )
+    page.query_prefix = urlencode({'q': query}) + '&'
+    return page
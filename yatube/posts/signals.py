@@ -0,0 +1,143 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.db.models import F
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from core import pagecache
+
+from . import caching, counters, feed, search, thumbnails
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Поля автора, которые выводятся в карточке поста
+CARD_AUTHOR_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+def comments_changed(post_id):
+    caching.bump_thread(post_id)
+    post = Post.objects.filter(
+        pk=post_id).values_list('author_id', 'group_id').first()
+    if post is not None:
+        author_id, group_id = post
+        caching.bump_author_feeds(author_id)
+        caching.purge_post_pages((post_id, author_id, group_id))
+
+
+@receiver(post_save, sender=Group)
+def group_changed(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        caching.bump_card_versions(Post.objects.filter(group=instance))
+        caching.bump_cards()
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    caching.bump_card_versions(Post.objects.filter(group=instance))
+    caching.bump_cards()
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, created, update_fields=None,
+                   raw=False, **kwargs):
+    if created or raw:
+        return
+    if update_fields is None or CARD_AUTHOR_FIELDS & set(update_fields):
+        caching.bump_card_versions(Post.objects.filter(author=instance))
+        caching.bump_cards()
+
+
+@receiver(pre_save, sender=Post)
+def bump_post_version(sender, instance, raw=False, **kwargs):
+    # В базе, как и в caching.bump_card_versions: версия из памяти
+    # могла отстать, и номер со старой карточкой в кэше повторился бы
+    if not raw and not instance._state.adding:
+        posts = Post.objects.filter(pk=instance.pk)
+        posts.update(version=F('version') + 1)
+        instance.version = posts.values_list('version', flat=True).get()
+
+
+@receiver(post_save, sender=Post)
+def deliver_post(sender, instance, created, raw=False, **kwargs):
+    """Новый пост раскладывается по лентам подписчиков."""
+    if raw:
+        return
+    old_group_id = getattr(instance, '_loaded_group_id', None)
+    if created:
+        counters.change_user(instance.author_id, posts_count=1)
+        counters.change_group(instance.group_id, 1)
+        feed.forget_recent_posts(instance.author_id)
+        feed.push_post(instance)
+    elif old_group_id != instance.group_id:
+        counters.change_group(old_group_id, -1)
+        counters.change_group(instance.group_id, 1)
+    instance._loaded_group_id = instance.group_id
+    image = instance.image.name
+    if image and image != getattr(instance, '_loaded_image', None):
+        transaction.on_commit(lambda: thumbnails.enqueue(image))
+    instance._loaded_image = image
+    caching.bump_author_feeds(instance.author_id)
+    caching.purge_post_pages(
+        (instance.pk, instance.author_id, old_group_id),
+        (instance.pk, instance.author_id, instance.group_id))
+
+
+@receiver(post_delete, sender=Post)
+def forget_post(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, posts_count=-1)
+    counters.change_group(instance.group_id, -1)
+    feed.forget_recent_posts(instance.author_id)
+    caching.bump_author_feeds(instance.author_id)
+    caching.purge_post_pages(
+        (instance.pk, instance.author_id, instance.group_id))
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.change_post(instance.post_id, 1)
+        comments_changed(instance.post_id)
+    else:
+        caching.bump_thread(instance.post_id)
+        pagecache.purge(caching.POST_PAGES.format(instance.post_id))
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    counters.change_post(instance.post_id, -1)
+    comments_changed(instance.post_id)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    """При подписке в ленту добавляются уже вышедшие посты автора."""
+    if created and not raw:
+        counters.change_user(instance.author_id, followers_count=1)
+        counters.change_user(instance.user_id, following_count=1)
+        feed.backfill(instance.user_id, instance.author_id)
+        caching.bump_follow([instance.user_id])
+        if (feed.followers_counts([instance.author_id])[instance.author_id]
+                == settings.FEED_CELEBRITY_THRESHOLD):
+            caching.bump_celebrities()
+
+
+@receiver(post_delete, sender=Follow)
+def purge_timeline(sender, instance, **kwargs):
+    """При отписке посты автора убираются из ленты."""
+    counters.change_user(instance.author_id, followers_count=-1)
+    counters.change_user(instance.user_id, following_count=-1)
+    feed.purge(instance.user_id, instance.author_id)
+    demoted = feed.demote(instance.author_id)
+    caching.bump_follow([instance.user_id, *(demoted or [])])
+    if demoted is not None:
+        caching.bump_celebrities()
+
+
+def ensure_search_index(sender, using, **kwargs):
+    """SQLite сбрасывает триггеры при пересоздании posts_post."""
+    search.install(connections[using])
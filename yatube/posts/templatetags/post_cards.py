@@ -0,0 +1,51 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+from posts import thumbnails
+
+register = template.Library()
+
+CARD_KEY = 'post_card:{pk}:{version}:{comments}:{links}:{followed}'
+
+
+def card_key(post, is_not_profile):
+    """
+    Ключ карточки: меняется вместе с версией поста и его счетчиками.
+    Отметка подписки - единственная часть карточки, зависящая от
+    читателя, поэтому вариантов у карточки всего два.
+    """
+    return CARD_KEY.format(
+        pk=post.pk,
+        version=post.version,
+        comments=post.comments_count,
+        links=int(bool(is_not_profile)),
+        followed=int(bool(getattr(post, 'author_is_followed', False))),
+    )
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, page_obj):
+    """
+    Карточки постов страницы: все берутся из кэша одним get_many,
+    рендерятся только промахи, а их миниатюры читаются одним запросом.
+    Использование:
+    {% post_cards page_obj as cards %}{% for card in cards %}...
+    """
+    is_not_profile = context.get('is_not_profile')
+    keys = [card_key(post, is_not_profile) for post in page_obj]
+    cards = cache.get_many(keys)
+    missed = {}
+    card_template = get_template('includes/posts.html')
+    misses = [(key, post) for key, post in zip(keys, page_obj)
+              if key not in cards]
+    # Миниатюры нужны только перерисовываемым карточкам
+    thumbnails.prefetch([post for _, post in misses])
+    for key, post in misses:
+        missed[key] = cards[key] = card_template.render(
+            {'post': post, 'is_not_profile': is_not_profile})
+    if missed:
+        cache.set_many(missed, settings.POST_CARD_TIMEOUT)
+    return [mark_safe(cards[key]) for key in keys]
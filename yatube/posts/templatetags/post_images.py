@@ -0,0 +1,18 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(post, alias):
+    """
+    Готовая миниатюра картинки поста или None, если она еще в очереди.
+    Берется из thumbnails.prefetch, если страница ее уже загрузила.
+    {% post_thumbnail post 'card' as im %}
+    """
+    prefetched = getattr(post, 'thumbnails', None)
+    if prefetched is not None and alias in prefetched:
+        return prefetched[alias]
+    return thumbnails.lookup(post.image, alias)
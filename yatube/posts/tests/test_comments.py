@@ -0,0 +1,55 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+@override_settings(COMMENTS_AMOUNT=3)
+class CommentThreadTest(TestCase):
+    """Тест ветки комментариев на странице поста"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(text='Тестовый текст', author=cls.user)
+        for number in range(5):
+            Comment.objects.create(
+                text=f'Комментарий {number}', post=cls.post, author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(CommentThreadTest.user)
+        self.url = reverse(
+            'posts:post_detail', args=[CommentThreadTest.post.pk])
+
+    def test_missing_post_is_404(self):
+        """Несуществующий пост - 404, а не 500"""
+        response = self.client.get(
+            reverse('posts:post_detail', args=[10 ** 6]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_comments_newest_first_by_cursor(self):
+        """Комментарии листаются курсором, новые первыми"""
+        page = self.client.get(self.url).context['comments']
+        self.assertEqual([comment.text for comment in page], [
+            'Комментарий 4', 'Комментарий 3', 'Комментарий 2'])
+        response = self.client.get(f'{self.url}?after={page.next_cursor}')
+        self.assertEqual([c.text for c in response.context['comments']],
+                         ['Комментарий 1', 'Комментарий 0'])
+
+    def test_thread_cached_until_new_comment(self):
+        """Ветка берется из кэша, новый комментарий ее обновляет"""
+        self.client.get(self.url)
+        Comment.objects.filter(text='Комментарий 4').update(text='Тихо')
+        self.assertContains(self.client.get(self.url), 'Комментарий 4')
+        self.client.post(
+            reverse('posts:add_comment', args=[CommentThreadTest.post.pk]),
+            {'text': 'Свежий комментарий'})
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Свежий комментарий')
+        self.assertContains(response, 'Тихо')
@@ -0,0 +1,90 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTest(TestCase):
+    """Тест ответов 304 по ETag и Last-Modified"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description='')
+        cls.post = Post.objects.create(
+            text='Тестовый текст', author=cls.user, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ConditionalGetTest.user)
+        self.urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=['test-slug']),
+            reverse('posts:profile', args=['auth']),
+            reverse('posts:post_detail', args=[ConditionalGetTest.post.pk]),
+        ]
+
+    def revalidate(self, client, url, response):
+        return client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_not_modified_without_feed_query(self):
+        """Повторный запрос без изменений - 304 без запросов ленты"""
+        # Сессия и пользователь; профилю еще нужен id автора по имени
+        queries = [2, 2, 3, 2]
+        for url, count in zip(self.urls, queries):
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                with self.assertNumQueries(count):
+                    repeat = self.revalidate(
+                        self.authorized_client, url, response)
+                self.assertEqual(
+                    repeat.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_last_modified_for_anonymous_only(self):
+        """Last-Modified отдается только анониму"""
+        url = reverse('posts:index')
+        response = self.guest_client.get(url)
+        repeat = self.guest_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(repeat.status_code, HTTPStatus.NOT_MODIFIED)
+        response = self.authorized_client.get(url)
+        self.assertNotIn('Last-Modified', response)
+
+    def test_etag_depends_on_viewer(self):
+        """Страница гостя не подходит вошедшему пользователю"""
+        url = reverse('posts:index')
+        response = self.guest_client.get(url)
+        repeat = self.revalidate(self.authorized_client, url, response)
+        self.assertEqual(repeat.status_code, HTTPStatus.OK)
+
+    def test_changes_invalidate_etag(self):
+        """Новый пост и комментарий меняют валидаторы страниц"""
+        responses = [self.guest_client.get(url) for url in self.urls]
+        Post.objects.create(
+            text='Новый пост', author=ConditionalGetTest.user,
+            group=ConditionalGetTest.group)
+        Comment.objects.create(
+            text='Комментарий', author=ConditionalGetTest.user,
+            post=ConditionalGetTest.post)
+        for url, response in zip(self.urls, responses):
+            with self.subTest(url=url):
+                repeat = self.revalidate(self.guest_client, url, response)
+                self.assertEqual(repeat.status_code, HTTPStatus.OK)
+
+    def test_deleted_post_is_404(self):
+        """Удаленный пост не отдается как неизмененный"""
+        url = reverse('posts:post_detail', args=[ConditionalGetTest.post.pk])
+        response = self.guest_client.get(url)
+        Post.objects.filter(pk=ConditionalGetTest.post.pk).delete()
+        repeat = self.revalidate(self.guest_client, url, response)
+        self.assertEqual(repeat.status_code, HTTPStatus.NOT_FOUND)
@@ -0,0 +1,93 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, UserCounters
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    """Тест денормализованных счетчиков"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+        cls.group2 = Group.objects.create(
+            title='Тестовая группа2',
+            slug='test-slug2',
+            description='Тестовое описание'
+        )
+
+    def setUp(self):
+        self.post = Post.objects.create(
+            text='Тестовый текст', author=self.user, group=self.group)
+
+    def counters(self, user):
+        return UserCounters.objects.get(user=user)
+
+    def test_post_counters(self):
+        """Создание и удаление поста меняет счетчики автора и группы"""
+        self.assertEqual(self.counters(self.user).posts_count, 1)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        self.post.delete()
+        self.assertEqual(self.counters(self.user).posts_count, 0)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+
+    def test_group_change_moves_counter(self):
+        """Смена группы при редактировании переносит счетчик"""
+        client = Client()
+        client.force_login(self.user)
+        client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.id}),
+            data={'text': 'Новый текст', 'group': self.group2.id})
+        self.group.refresh_from_db()
+        self.group2.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.group2.posts_count, 1)
+
+    def test_save_keeps_counters(self):
+        """Сохранение загруженного ранее объекта не затирает счетчики"""
+        post = Post.objects.get(pk=self.post.pk)
+        Comment.objects.create(post=post, author=self.reader, text='Ок')
+        post.text = 'Правка'
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        group = Group.objects.get(pk=self.group2.pk)
+        Post.objects.create(text='Еще пост', author=self.user,
+                            group=self.group2)
+        group.description = 'Новое описание'
+        group.save()
+        group.refresh_from_db()
+        self.assertEqual(group.posts_count, 1)
+
+    def test_comment_and_follow_counters(self):
+        """Комментарии и подписки считаются"""
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Коммент')
+        Follow.objects.create(user=self.reader, author=self.user)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        self.assertEqual(self.counters(self.user).followers_count, 1)
+        self.assertEqual(self.counters(self.reader).following_count, 1)
+
+    def test_reconcile_fixes_drift(self):
+        """reconcile_counters исправляет расхождения"""
+        UserCounters.objects.filter(user=self.user).update(posts_count=42)
+        Group.objects.filter(pk=self.group.pk).update(posts_count=7)
+        call_command('reconcile_counters', batch_size=1, stdout=StringIO())
+        self.assertEqual(self.counters(self.user).posts_count, 1)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
@@ -0,0 +1,127 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import export
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ExportTest(TestCase):
+    """Тест потоковой выгрузки"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description='')
+        for number in range(5):
+            post = Post.objects.create(
+                text=f'Пост {number}', author=cls.user,
+                group=cls.group if number % 2 else None)
+        Post.objects.filter(text='Пост 0').update(
+            pub_date=timezone.now() - timedelta(days=30))
+        Comment.objects.create(text='Комментарий', post=post,
+                               author=cls.reader)
+        Follow.objects.create(user=cls.reader, author=cls.user)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.output = os.path.join(self.directory, 'export')
+
+    def read_ndjson(self):
+        with open(self.output) as file:
+            return [json.loads(line) for line in file]
+
+    def test_ndjson_all_kinds(self):
+        """Выгружаются все виды записей с типом в каждой строке"""
+        out = StringIO()
+        call_command('export_posts', stdout=out)
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        types = [row['type'] for row in rows]
+        self.assertEqual(types.count('posts'), 5)
+        self.assertEqual(types.count('comments'), 1)
+        self.assertEqual(types.count('follows'), 1)
+        self.assertEqual(types.count('groups'), 1)
+        post = next(row for row in rows
+                    if row['type'] == 'posts' and row['text'] == 'Пост 1')
+        self.assertEqual(post['author'], 'auth')
+        self.assertEqual(post['group'], 'test-slug')
+
+    def test_csv_with_filters(self):
+        """CSV с фильтрами по группе и дате"""
+        since = (timezone.now() - timedelta(days=1)).date().isoformat()
+        call_command('export_posts', 'posts', '--since', since,
+                     format='csv', output=self.output, group='test-slug',
+                     stdout=StringIO())
+        with open(self.output, newline='') as file:
+            rows = list(csv.DictReader(file))
+        self.assertEqual({row['text'] for row in rows}, {'Пост 1', 'Пост 3'})
+        call_command('export_posts', 'posts', '--until', since,
+                     format='csv', output=self.output, stdout=StringIO())
+        with open(self.output, newline='') as file:
+            rows = list(csv.DictReader(file))
+        self.assertEqual([row['text'] for row in rows], ['Пост 0'])
+
+    def test_csv_needs_single_kind(self):
+        """В один CSV нельзя выгрузить разные виды записей"""
+        with self.assertRaises(CommandError):
+            call_command('export_posts', format='csv', stdout=StringIO())
+
+    def test_resume_from_checkpoint(self):
+        """После сбоя выгрузка продолжается без повторов и пропусков"""
+        checkpoint = os.path.join(self.directory, 'checkpoint.json')
+        chunks = export.chunks
+
+        def failing(*args, **kwargs):
+            for number, chunk in enumerate(chunks(*args, **kwargs)):
+                if number == 2:
+                    raise RuntimeError('сбой')
+                yield chunk
+
+        with mock.patch('posts.export.chunks', failing):
+            with self.assertRaises(RuntimeError):
+                call_command('export_posts', 'posts', 'comments',
+                             output=self.output, checkpoint=checkpoint,
+                             chunk_size=2, stdout=StringIO())
+        self.assertEqual(len(self.read_ndjson()), 4)
+        call_command('export_posts', 'posts', 'comments',
+                     output=self.output, checkpoint=checkpoint,
+                     chunk_size=2, stdout=StringIO())
+        rows = self.read_ndjson()
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(len({(row['type'], row['id']) for row in rows}), 6)
+        with self.assertRaises(CommandError):
+            call_command('export_posts', 'posts', output=self.output,
+                         checkpoint=checkpoint, stdout=StringIO())
+
+    def test_admin_action_streams(self):
+        """Действие админки отдает выбранные посты потоком"""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        client = Client()
+        client.force_login(admin)
+        selected = Post.objects.filter(group=ExportTest.group)
+        response = client.post(reverse('admin:posts_post_changelist'), {
+            'action': 'export_ndjson',
+            '_selected_action': [post.pk for post in selected],
+        })
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b''.join(
+            response.streaming_content).decode().splitlines()]
+        self.assertEqual({row['id'] for row in rows},
+                         {post.pk for post in selected})
@@ -0,0 +1,156 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import feed
+from posts.models import Follow, Post, TimelineEntry
+from posts.utils import CursorPaginator
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+    """Тест материализованной ленты подписок"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.old_post = Post.objects.create(
+            text='Старый пост', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(TimelineTest.reader)
+
+    def follow(self):
+        self.client.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': TimelineTest.author.username}))
+
+    def test_follow_backfills_timeline(self):
+        """Подписка добавляет в ленту уже вышедшие посты"""
+        self.follow()
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=TimelineTest.reader, post=TimelineTest.old_post).exists())
+
+    def test_new_post_pushed_to_followers(self):
+        """Новый пост доставляется подписчикам"""
+        self.follow()
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'][0], post)
+
+    def test_cached_page_skips_feed_queries(self):
+        """Страница из кэша фрагментов не читает ленту и подписки"""
+        self.follow()
+        url = reverse('posts:follow_index')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertFalse([query['sql'] for query in queries
+                          if 'posts_' in query['sql']])
+
+    def test_unfollow_purges_timeline(self):
+        """Отписка очищает ленту от постов автора"""
+        self.follow()
+        self.client.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': TimelineTest.author.username}))
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=TimelineTest.reader).exists())
+
+    def test_cursor_pages_follow_timeline_index(self):
+        """Курсор ленты сортирует и сравнивает колонки одной записи ленты"""
+        self.follow()
+        for number in range(4):
+            Post.objects.create(text=f'Пост {number}', author=self.author)
+        paginator = CursorPaginator(
+            feed.timeline_posts(TimelineTest.reader), 2)
+        first = paginator.get_page()
+        with CaptureQueriesContext(connection) as queries:
+            second = paginator.get_page(after=first.next_cursor)
+        sql = queries[0]['sql']
+        self.assertEqual(sql.count('"posts_timelineentry" ON'), 1)
+        self.assertIn('"posts_timelineentry"."post_id" <', sql)
+        back = paginator.get_page(before=second.previous_cursor)
+        self.assertEqual(list(back), list(first))
+        expected = list(Post.objects.filter(author=self.author).order_by(
+            '-pub_date', '-pk'))
+        self.assertEqual(list(first) + list(second), expected[:4])
+
+    def test_rebuild_command(self):
+        """Команда rebuild_timelines восстанавливает ленты"""
+        Follow.objects.create(
+            user=TimelineTest.reader, author=TimelineTest.author)
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=TimelineTest.reader).count(),
+            Post.objects.filter(author=TimelineTest.author).count())
+
+
+@override_settings(FEED_CELEBRITY_THRESHOLD=2)
+class HybridFeedTest(TestCase):
+    """Тест подмешивания постов популярных авторов при чтении"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.fan = User.objects.create_user(username='fan')
+        cls.star = User.objects.create_user(username='star')
+        cls.author = User.objects.create_user(username='author')
+
+    def setUp(self):
+        cache.clear()
+        Follow.objects.create(user=HybridFeedTest.fan,
+                              author=HybridFeedTest.star)
+        Follow.objects.create(user=HybridFeedTest.reader,
+                              author=HybridFeedTest.star)
+        Follow.objects.create(user=HybridFeedTest.reader,
+                              author=HybridFeedTest.author)
+        self.client = Client()
+        self.client.force_login(HybridFeedTest.reader)
+
+    def test_celebrity_post_is_not_pushed(self):
+        """Пост популярного автора не пишется в ленты"""
+        post = Post.objects.create(text='Пост звезды', author=self.star)
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+
+    def test_feed_merges_push_and_pull(self):
+        """Лента объединяет оба источника в порядке публикации"""
+        posts = [
+            Post.objects.create(text='Пост автора', author=self.author),
+            Post.objects.create(text='Пост звезды', author=self.star),
+            Post.objects.create(text='Еще пост автора', author=self.author),
+        ]
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']), posts[::-1])
+
+    def test_dropping_below_threshold_backfills(self):
+        """Автор ниже порога возвращается в ленты со всеми постами"""
+        post = Post.objects.create(text='Пост звезды', author=self.star)
+        Follow.objects.filter(user=self.fan, author=self.star).delete()
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post).exists())
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'])
+
+    def test_rising_above_threshold_pulls_posts(self):
+        """Автор, ставший популярным, подмешивается в ленты при чтении"""
+        self.client.get(reverse('posts:follow_index'))
+        Follow.objects.create(user=HybridFeedTest.fan,
+                              author=HybridFeedTest.author)
+        post = Post.objects.create(text='Пост новой звезды',
+                                   author=self.author)
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'][0], post)
@@ -0,0 +1,168 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+
+from posts import counters
+from posts.models import (Comment, Follow, Group, Post, TimelineEntry,
+                          UserCounters)
+from posts.search import search_posts
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImportTest(TestCase):
+    """Тест массовой загрузки"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def load(self, rows, *args, **options):
+        path = os.path.join(self.directory, 'import.ndjson')
+        with open(path, 'w', encoding='utf-8') as file:
+            for row in rows:
+                file.write(row if isinstance(row, str)
+                           else json.dumps(row, ensure_ascii=False))
+                file.write('\n')
+        call_command('import_posts', path, *args, stdout=StringIO(),
+                     stderr=StringIO(), **options)
+
+    def test_import_keeps_derived_data(self):
+        """Загрузка заполняет счетчики, ленты и поиск без сигналов"""
+        self.load([
+            {'type': 'groups', 'slug': 'cats', 'title': 'Кошки',
+             'description': ''},
+            {'type': 'posts', 'id': 10, 'author': 'author', 'group': 'cats',
+             'text': 'Пушистый барсик', 'pub_date': '2020-01-02T03:04:05'},
+            {'type': 'posts', 'id': 11, 'author': 'newbie', 'text': 'Привет'},
+            {'type': 'comments', 'post_id': 10, 'author': 'reader',
+             'text': 'Мяу', 'created': '2020-01-03T00:00:00+00:00'},
+            {'type': 'follows', 'user': 'author', 'author': 'newbie'},
+            {'type': 'follows', 'user': 'reader', 'author': 'author'},
+        ], '--create-users', batch_size=2)
+        post = Post.objects.get(text='Пушистый барсик')
+        self.assertEqual(
+            (post.pub_date.year, post.pub_date.hour), (2020, 3))
+        self.assertEqual(post.group.posts_count, 1)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(post.comments.get().created.day, 3)
+        newbie = User.objects.get(username='newbie')
+        self.assertFalse(newbie.has_usable_password())
+        self.assertEqual(
+            UserCounters.objects.get(user=self.author).posts_count, 1)
+        self.assertEqual(
+            UserCounters.objects.get(user=newbie).followers_count, 1)
+        self.assertEqual(Follow.objects.count(), 2)
+        self.assertEqual(
+            set(TimelineEntry.objects.values_list('user', 'post')),
+            {(self.reader.pk, post.pk),
+             (self.author.pk, Post.objects.get(text='Привет').pk)})
+        self.assertEqual(list(search_posts('барсик', per_page=10)), [post])
+
+    def test_invalid_batch_is_not_written(self):
+        """Ошибочная пачка не пишется, а с --skip-invalid пропускается"""
+        rows = [
+            {'type': 'posts', 'author': 'author', 'text': 'Первый'},
+            {'type': 'posts', 'author': 'nobody', 'text': 'Второй'},
+            'не json',
+            {'type': 'comments', 'post_id': 99, 'author': 'author',
+             'text': 'Куда?'},
+        ]
+        with self.assertRaises(CommandError):
+            self.load(rows)
+        self.assertFalse(Post.objects.filter(text='Первый').exists())
+        self.load(rows, '--skip-invalid')
+        self.assertEqual(
+            list(Post.objects.values_list('text', flat=True)), ['Первый'])
+        self.assertFalse(Comment.objects.exists())
+
+    def test_images_copied(self):
+        """Картинки копируются из --images-dir в хранилище"""
+        os.mkdir(os.path.join(self.directory, 'posts'))
+        with open(os.path.join(self.directory, 'posts', 'cat.gif'),
+                  'wb') as file:
+            file.write(
+                b'\x47\x49\x46\x38\x39\x61\x02\x00\x01\x00\x80\x00\x00'
+                b'\x00\x00\x00\xFF\xFF\xFF\x21\xF9\x04\x00\x00\x00\x00'
+                b'\x00\x2C\x00\x00\x00\x00\x02\x00\x01\x00\x00\x02\x02'
+                b'\x0C\x0A\x00\x3B')
+        self.load([{'type': 'posts', 'author': 'author', 'text': 'Кот',
+                    'image': 'posts/cat.gif'}],
+                  images_dir=self.directory)
+        image = Post.objects.get(text='Кот').image
+        self.assertTrue(os.path.exists(image.path))
+        with self.assertRaises(CommandError):
+            self.load([{'type': 'posts', 'author': 'author', 'text': 'Пес',
+                        'image': '../secret.gif'}],
+                      images_dir=self.directory)
+
+    def test_dates_without_touching_model_fields(self):
+        """Даты из файла пишутся, auto_now_add модели не выключается"""
+        seen = []
+        recount = counters.recount_users
+
+        def spy(ids):
+            seen.append(Post._meta.get_field('pub_date').auto_now_add)
+            return recount(ids)
+
+        with mock.patch('posts.counters.recount_users', spy):
+            self.load([{'type': 'posts', 'author': 'author', 'text': 'Old',
+                        'pub_date': '2019-05-06T00:00:00+00:00'}])
+        self.assertEqual(seen, [True])
+        post = Post.objects.get(text='Old')
+        self.assertEqual((post.pub_date.year, post.created.year),
+                         (2019, 2019))
+
+    def test_failed_batch_removes_images(self):
+        """Откаченная пачка удаляет скопированные картинки"""
+        os.mkdir(os.path.join(self.directory, 'posts'))
+        with open(os.path.join(self.directory, 'posts', 'dog.gif'),
+                  'wb') as file:
+            file.write(b'GIF89a')
+        with mock.patch('posts.counters.recount_users',
+                        side_effect=DatabaseError('сбой')):
+            with self.assertRaises(DatabaseError):
+                self.load([{'type': 'posts', 'author': 'author',
+                            'text': 'Пес', 'image': 'posts/dog.gif'}],
+                          images_dir=self.directory)
+        self.assertFalse(Post.objects.filter(text='Пес').exists())
+        images = os.path.join(TEMP_MEDIA_ROOT, 'posts')
+        self.assertFalse(os.path.isdir(images) and any(
+            name.startswith('dog') for name in os.listdir(images)))
+
+    def test_existing_group_and_follow_skipped(self):
+        """Уже существующие группы и подписки не дублируются"""
+        Group.objects.create(title='Кошки', slug='cats', description='')
+        self.load([
+            {'type': 'groups', 'slug': 'cats', 'title': 'Другие кошки'},
+            {'type': 'follows', 'user': 'reader', 'author': 'author'},
+        ])
+        self.assertEqual(Group.objects.get().title, 'Кошки')
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(
+            UserCounters.objects.get(user=self.reader).following_count, 1)
@@ -0,0 +1,129 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class PageCacheTest(TestCase):
+    """Тест кэша страниц для анонимов"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description='')
+        cls.other_group = Group.objects.create(
+            title='Другая группа', slug='other-slug', description='')
+        cls.post = Post.objects.create(
+            text='Тестовый текст', author=cls.user, group=cls.group)
+        cls.other_post = Post.objects.create(
+            text='Другой текст', author=cls.other, group=cls.other_group)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def url(self, name, *args):
+        return reverse(f'posts:{name}', args=args)
+
+    def is_cached(self, url):
+        # Ответ из кэша не проходит через шаблоны
+        return self.guest_client.get(url).context is None
+
+    def test_hit_skips_database(self):
+        """Повторная страница гостю отдается без SQL"""
+        url = self.url('post_detail', PageCacheTest.post.pk)
+        first = self.guest_client.get(url)
+        with self.assertNumQueries(0):
+            second = self.guest_client.get(url)
+        self.assertEqual(first.content, second.content)
+        self.assertIn(f'post:{PageCacheTest.post.pk}',
+                      second['Surrogate-Key'])
+
+    def test_authorized_gets_personalized_shell(self):
+        """Вошедшему отдается та же страница со своими фрагментами"""
+        Follow.objects.create(
+            user=PageCacheTest.other, author=PageCacheTest.user)
+        client = Client()
+        client.force_login(PageCacheTest.other)
+        url = self.url('profile', 'auth')
+        self.guest_client.get(url)
+        response = client.get(url)
+        self.assertNotIn('page_obj', response.context)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertContains(response, 'Пользователь: other')
+        self.assertContains(response, 'Отписаться')
+        self.assertNotIn('Surrogate-Key', response)
+        self.assertEqual(int(response['Content-Length']),
+                         len(response.content))
+
+    def test_personalized_shell_revalidates(self):
+        """Страница с дырами отдает 304, пока не сменился читатель"""
+        client = Client()
+        client.force_login(PageCacheTest.other)
+        url = self.url('profile', 'auth')
+        self.guest_client.get(url)
+        etag = client.get(url)['ETag']
+        self.assertEqual(
+            client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        author = Client()
+        author.force_login(PageCacheTest.user)
+        self.assertNotEqual(author.get(url)['ETag'], etag)
+        Follow.objects.create(
+            user=PageCacheTest.other, author=PageCacheTest.user)
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Отписаться')
+
+    def test_fragments_endpoint(self):
+        """Фрагменты читателя отдаются отдельно по меткам дыр"""
+        client = Client()
+        client.force_login(PageCacheTest.other)
+        post = PageCacheTest.post
+        actions = f'post_actions:{post.pk}:{post.author_id}'
+        response = client.get(self.url('fragments'), {'hole': [
+            'header', actions, 'unknown', 'follow:not-a-number']})
+        fragments = response.json()
+        self.assertEqual(set(fragments), {'header', actions})
+        self.assertIn('Пользователь: other', fragments['header'])
+        self.assertNotIn('Редактировать запись', fragments[actions])
+
+    def test_new_post_purges_tagged_pages(self):
+        """Новый пост сбрасывает только страницы, где он виден"""
+        purged = [
+            self.url('index'),
+            self.url('group_list', 'test-slug'),
+            self.url('profile', 'auth'),
+        ]
+        kept = [
+            self.url('group_list', 'other-slug'),
+            self.url('profile', 'other'),
+            self.url('post_detail', PageCacheTest.other_post.pk),
+        ]
+        for url in purged + kept:
+            self.guest_client.get(url)
+        Post.objects.create(text='Новый пост', author=PageCacheTest.user,
+                            group=PageCacheTest.group)
+        for url in purged:
+            with self.subTest(url=url):
+                self.assertFalse(self.is_cached(url))
+        for url in kept:
+            with self.subTest(url=url):
+                self.assertTrue(self.is_cached(url))
+
+    def test_edit_and_comment_purge_post_page(self):
+        """Правка поста и комментарий сбрасывают страницу поста"""
+        url = self.url('post_detail', PageCacheTest.post.pk)
+        self.guest_client.get(url)
+        post = Post.objects.get(pk=PageCacheTest.post.pk)
+        post.text = 'Исправленный текст'
+        post.save()
+        self.assertContains(self.guest_client.get(url), 'Исправленный текст')
+        Comment.objects.create(text='Новый комментарий', post=post,
+                               author=PageCacheTest.other)
+        self.assertContains(self.guest_client.get(url), 'Новый комментарий')
@@ -0,0 +1,70 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+from posts.urls import query_budgets
+
+User = get_user_model()
+
+
+class QueryBudgetsTest(TestCase):
+    """Страницы укладываются в бюджет SQL-запросов из posts.urls"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug',
+            description='Тестовое описание')
+        authors = [User.objects.create_user(username=f'author{number}')
+                   for number in range(3)]
+        cls.reader = User.objects.create_user(username='reader')
+        for author in authors:
+            Follow.objects.create(user=cls.reader, author=author)
+            Follow.objects.create(user=author, author=cls.reader)
+        cls.post = None
+        for number in range(15):
+            cls.post = Post.objects.create(
+                text=f'Тестовый текст {number}',
+                author=authors[number % 3], group=cls.group)
+        for number in range(12):
+            Comment.objects.create(
+                text='Комментарий', post=cls.post,
+                author=authors[number % 3])
+
+    def urls(self):
+        return {
+            'index': reverse('posts:index'),
+            'group_list': reverse('posts:group_list', args=['test-slug']),
+            'profile': reverse('posts:profile', args=['author0']),
+            'post_detail': reverse(
+                'posts:post_detail', args=[QueryBudgetsTest.post.pk]),
+            'follow_index': reverse('posts:follow_index'),
+            'fragments': reverse('posts:fragments') + (
+                '?hole=header&hole=badge:1&hole=follow:2'),
+            'search': reverse('posts:search') + '?q=Тестовый',
+            'post_create': reverse('posts:post_create'),
+            'post_edit': reverse(
+                'posts:post_edit', args=[QueryBudgetsTest.post.pk]),
+        }
+
+    def test_every_budget_is_checked(self):
+        """У каждого бюджета есть страница для проверки"""
+        self.assertEqual(set(self.urls()), set(query_budgets))
+
+    def test_pages_fit_budgets(self):
+        """Страницы не выходят за бюджет и при пустом кэше"""
+        client = Client()
+        client.force_login(QueryBudgetsTest.post.author)
+        for name, url in self.urls().items():
+            with self.subTest(name=name):
+                cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    response = client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertLessEqual(
+                    len(queries), query_budgets[name],
+                    '\n'.join(query['sql'] for query in queries))
@@ -0,0 +1,68 @@
+from django.contrib.admin.sites import site
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Post
+from posts.search import match_expression, search_posts
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    """Тест полнотекстового поиска"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.best = Post.objects.create(
+            text='Котики котики котики', author=cls.user)
+        cls.other = Post.objects.create(
+            text='Про котиков и собак', author=cls.user)
+        Post.objects.bulk_create(
+            [Post(text=f'Собака номер {x}', author=cls.user)
+             for x in range(5)])
+
+    def test_match_expression_is_escaped(self):
+        """Кавычки во вводе не ломают запрос FTS5"""
+        self.assertEqual(match_expression('a "b'), '"a" """b"*')
+        self.assertEqual(match_expression('   '), '')
+
+    def test_ranked_results(self):
+        """Лучшее совпадение идет первым, лишнего нет"""
+        page = search_posts('котики', per_page=10)
+        self.assertEqual(list(page), [SearchTest.best])
+
+    def test_prefix_and_sync_on_update(self):
+        """Индекс следует за изменениями текста, ищется по префиксу"""
+        Post.objects.filter(pk=SearchTest.other.pk).update(
+            text='Про хомяков')
+        self.assertEqual(
+            list(search_posts('хомяк', per_page=10)), [SearchTest.other])
+        self.assertEqual(
+            list(search_posts('котик', per_page=10)), [SearchTest.best])
+
+    def test_cursor_pages(self):
+        """Результаты листаются курсором"""
+        first = search_posts('собака', per_page=3)
+        second = search_posts('собака', per_page=3, after=first.next_cursor)
+        self.assertEqual(len(first), 3)
+        self.assertEqual(len(second), 2)
+        self.assertFalse(set(first) & set(second))
+        back = search_posts(
+            'собака', per_page=3, before=second.previous_cursor)
+        self.assertEqual(list(back), list(first))
+
+    def test_search_view(self):
+        """Страница поиска доступна гостю"""
+        response = Client().get(reverse('posts:search'), {'q': 'котики'})
+        self.assertTemplateUsed(response, 'posts/search.html')
+        self.assertEqual(
+            list(response.context['page_obj']), [SearchTest.best])
+
+    def test_admin_uses_index(self):
+        """Поиск в админке идет через тот же индекс"""
+        queryset, use_distinct = site._registry[Post].get_search_results(
+            None, Post.objects.all(), 'котики')
+        self.assertEqual(list(queryset), [SearchTest.best])
+        self.assertFalse(use_distinct)
@@ -0,0 +1,59 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+
+from posts.caching import bump_card_versions
+from posts.models import Group, Post
+from posts.templatetags.post_cards import card_key, post_cards
+
+User = get_user_model()
+
+
+class PostCardsTest(TestCase):
+    """Тест кэша карточек постов"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            text='Тестовый текст', author=self.user, group=self.group)
+
+    def render(self):
+        post = Post.objects.select_related('author', 'group').get(
+            pk=self.post.pk)
+        return post_cards({'is_not_profile': True}, [post])[0]
+
+    def test_card_is_cached(self):
+        """Карточка попадает в кэш под версионным ключом"""
+        card = self.render()
+        self.assertEqual(cache.get(card_key(self.post, True)), card)
+
+    def test_edit_bumps_version(self):
+        """Редактирование поста делает старую карточку недоступной"""
+        self.render()
+        self.post.text = 'Новый текст'
+        self.post.save()
+        self.assertIn('Новый текст', self.render())
+
+    def test_edit_after_concurrent_bump(self):
+        """Правка после чужого сдвига версии не повторяет ее номер"""
+        bump_card_versions(Post.objects.filter(pk=self.post.pk))
+        self.render()
+        self.post.text = 'Новый текст'
+        self.post.save()
+        self.assertIn('Новый текст', self.render())
+
+    def test_group_change_bumps_version(self):
+        """Изменение группы обновляет карточки ее постов"""
+        self.render()
+        self.group.slug = 'new-slug'
+        self.group.save()
+        self.assertIn('/group/new-slug/', self.render())
@@ -0,0 +1,87 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import thumbnails
+from posts.models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailsTest(TestCase):
+    """Тест заблаговременной генерации миниатюр"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(
+            text='Тестовый текст',
+            author=cls.user,
+            image=SimpleUploadedFile(
+                name='thumb.gif', content=SMALL_GIF,
+                content_type='image/gif'),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_placeholder_until_generated(self):
+        """Пока миниатюры нет, страница показывает заглушку"""
+        image = ThumbnailsTest.post.image
+        self.assertIsNone(thumbnails.lookup(image, 'card'))
+        response = Client().get(
+            reverse('posts:post_detail', args=[ThumbnailsTest.post.pk]))
+        self.assertContains(response, 'img/placeholder.svg')
+
+    def test_generate_then_lookup(self):
+        """После генерации миниатюра находится, карточка перерисуется"""
+        image = ThumbnailsTest.post.image
+        thumbnails.enqueue(image.name)
+        thumb = thumbnails.lookup(image, 'card')
+        self.assertIsNotNone(thumb)
+        self.assertEqual((thumb.width, thumb.height), (960, 339))
+        self.assertEqual(
+            Post.objects.get(pk=ThumbnailsTest.post.pk).version,
+            ThumbnailsTest.post.version + 1)
+        response = Client().get(
+            reverse('posts:post_detail', args=[ThumbnailsTest.post.pk]))
+        self.assertContains(response, thumb.url)
+        self.assertNotContains(response, 'img/placeholder.svg')
+
+    def test_prefetch_page(self):
+        """Миниатюры страницы читаются одним запросом, затем из кэша"""
+        thumbnails.enqueue(ThumbnailsTest.post.image.name)
+        Post.objects.create(text='Без картинки', author=ThumbnailsTest.user)
+        cache.clear()
+        posts = list(Post.objects.all())
+        with self.assertNumQueries(1):
+            thumbnails.prefetch(posts)
+        with self.assertNumQueries(0):
+            thumbnails.prefetch(posts)
+        post = next(p for p in posts if p.pk == ThumbnailsTest.post.pk)
+        self.assertEqual(
+            post.thumbnails['card'].url,
+            thumbnails.lookup(post.image, 'card').url)
@@ -0,0 +1,110 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.paginator import Page
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Post
+from posts.utils import (CursorPage, CursorPaginator, LazyPaginator,
+                         decode_cursor)
+
+User = get_user_model()
+
+
+class CursorPaginatorTest(TestCase):
+    """Тест пагинации по курсору"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.bulk_create(
+            [Post(text=f'Тестовый текст{x}', author=cls.user)
+             for x in range(settings.POSTS_AMOUNT + settings.EXTRA_POSTS)]
+        )
+        cls.ordered = list(Post.objects.order_by('-pub_date', '-pk'))
+
+    def setUp(self):
+        self.paginator = CursorPaginator(
+            Post.objects.all(), settings.POSTS_AMOUNT)
+
+    def test_first_page(self):
+        """Первая страница: только ссылка вперед"""
+        page = self.paginator.get_page()
+        self.assertEqual(list(page), self.ordered[:settings.POSTS_AMOUNT])
+        self.assertTrue(page.has_next())
+        self.assertFalse(page.has_previous())
+
+    def test_next_and_previous_pages(self):
+        """Переход вперед и назад по токенам"""
+        first = self.paginator.get_page()
+        second = self.paginator.get_page(after=first.next_cursor)
+        self.assertEqual(list(second), self.ordered[settings.POSTS_AMOUNT:])
+        self.assertFalse(second.has_next())
+        self.assertTrue(second.has_previous())
+        back = self.paginator.get_page(before=second.previous_cursor)
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(back.has_previous())
+
+    def test_broken_cursor_returns_first_page(self):
+        """Битый токен ведет на первую страницу"""
+        self.assertIsNone(decode_cursor('not-a-cursor'))
+        page = self.paginator.get_page(after='not-a-cursor')
+        self.assertEqual(list(page), self.ordered[:settings.POSTS_AMOUNT])
+
+    @override_settings(CURSOR_PAGINATION=True)
+    def test_index_uses_cursor_page(self):
+        """В режиме курсора лента получает CursorPage"""
+        cache.clear()
+        client = Client()
+        response = client.get(reverse('posts:index'))
+        page = response.context['page_obj']
+        self.assertIsInstance(page, CursorPage)
+        response = client.get(
+            reverse('posts:index') + f'?after={page.next_cursor}')
+        self.assertEqual(
+            len(response.context['page_obj']), settings.EXTRA_POSTS)
+
+
+class LazyPaginatorTest(TestCase):
+    """Тест ленивой постраничной пагинации"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.bulk_create(
+            [Post(text=f'Тестовый текст{x}', author=cls.user)
+             for x in range(settings.POSTS_AMOUNT + settings.EXTRA_POSTS)]
+        )
+        cls.ordered = list(Post.objects.order_by('-pub_date', '-pk'))
+
+    def setUp(self):
+        self.paginator = LazyPaginator(
+            Post.objects.order_by('-pub_date', '-pk'), settings.POSTS_AMOUNT)
+
+    def test_first_page_reads_nothing(self):
+        """Первая страница - Page, база читается только при обходе"""
+        with CaptureQueriesContext(connection) as queries:
+            page = self.paginator.get_page(None)
+        self.assertEqual(type(page), Page)
+        self.assertFalse(queries)
+        self.assertEqual(list(page), self.ordered[:settings.POSTS_AMOUNT])
+        self.assertTrue(page.has_next())
+
+    def test_out_of_range_page_is_last(self):
+        """Страница за концом ленты, как у Paginator, - последняя"""
+        page = self.paginator.get_page(100)
+        self.assertEqual(page.number, 2)
+        self.assertEqual(list(page), self.ordered[settings.POSTS_AMOUNT:])
+
+    def test_short_page_skips_count(self):
+        """Неполная страница сама дает число записей"""
+        paginator = LazyPaginator(
+            Post.objects.order_by('-pub_date', '-pk'), 100)
+        with CaptureQueriesContext(connection) as queries:
+            page = paginator.get_page(None)
+            self.assertEqual(len(page), len(self.ordered))
+            self.assertFalse(page.has_next())
+        self.assertEqual(len(queries), 1)
@@ -0,0 +1,61 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import viewer
+from posts.models import Follow, Post
+
+User = get_user_model()
+
+
+class ViewerFlagsTest(TestCase):
+    """Тест флагов отношения читателя к авторам"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.fan = User.objects.create_user(username='fan')
+        cls.other = User.objects.create_user(username='other')
+        Follow.objects.create(user=cls.fan, author=cls.author)
+        Follow.objects.create(user=cls.other, author=cls.author)
+        Post.objects.create(text='Тестовый текст', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def client_for(self, user):
+        client = Client()
+        client.force_login(user)
+        return client
+
+    def test_profile_follow_state_is_per_viewer(self):
+        """Состояние подписки в профиле зависит от читателя"""
+        url = reverse('posts:profile', args=['author'])
+        self.assertTrue(self.client_for(
+            ViewerFlagsTest.fan).get(url).context['following'])
+        Follow.objects.filter(user=ViewerFlagsTest.other).delete()
+        self.assertFalse(self.client_for(
+            ViewerFlagsTest.other).get(url).context['following'])
+        self.assertFalse(Client().get(url).context['following'])
+
+    def test_flags_in_one_query(self):
+        """Флаги авторов всей страницы приходят одним запросом"""
+        posts = viewer.posts(ViewerFlagsTest.fan, Post.objects.all())
+        with self.assertNumQueries(1):
+            flags = [(post.author_is_followed, post.author_is_viewer)
+                     for post in posts]
+        self.assertEqual(flags, [(True, False)])
+        posts = viewer.posts(ViewerFlagsTest.author, Post.objects.all())
+        self.assertEqual(
+            [(post.author_is_followed, post.author_is_viewer)
+             for post in posts], [(False, True)])
+
+    def test_index_cards_follow_badge(self):
+        """Отметка подписки на главной видна только подписчику"""
+        url = reverse('posts:index')
+        self.assertContains(
+            self.client_for(ViewerFlagsTest.fan).get(url), 'Вы подписаны')
+        self.assertNotContains(
+            self.client_for(ViewerFlagsTest.author).get(url), 'Вы подписаны')
+        self.assertNotContains(Client().get(url), 'Вы подписаны')
@@ -1,11 +1,13 @@
 import shutil
 import tempfile
 from http import HTTPStatus
+from unittest import mock
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import OperationalError
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
@@ -209,7 +211,9 @@ class TaskPagesTests(TestCase):
         """Проверка сохранения кэша на главной странице"""
         response1 = self.authorized_client.get(reverse('posts:index',),)
         content_before = response1.content
-        TaskPagesTests.post.delete()
+        # Изменение в обход ORM-сигналов не сбрасывает кэш
+        Post.objects.filter(pk=TaskPagesTests.post.pk).update(
+            text='Текст без сигнала')
         response2 = self.authorized_client.get(reverse('posts:index'))
         content_after = response2.content
         self.assertEqual(content_before, content_after)
@@ -218,6 +222,34 @@ class TaskPagesTests(TestCase):
         content_after_clearing_cache = response3.content
         self.assertNotEqual(content_before, content_after_clearing_cache)
 
+    def test_index_cache_invalidated_on_delete(self):
+        """Удаление поста сразу сбрасывает кэш главной"""
+        self.authorized_client.get(reverse('posts:index'))
+        TaskPagesTests.post3.delete()
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'Тестовый текст3')
+
+    def test_index_served_stale_when_database_fails(self):
+        """Пока БД недоступна, главная собирается из прежней копии"""
+        cache.clear()
+        self.authorized_client.get(reverse('posts:index'))
+        Post.objects.filter(text='Тестовый текст3').delete()
+        with mock.patch('posts.views.make_pagination',
+                        side_effect=OperationalError), \
+                self.assertLogs('core.stampede', 'WARNING'):
+            response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Тестовый текст3')
+
+    def test_follow_cache_not_shared_between_users(self):
+        """Кэш ленты подписок у каждого читателя свой"""
+        Follow.objects.create(
+            user=TaskPagesTests.user, author=TaskPagesTests.user2)
+        self.authorized_client.get(reverse('posts:follow_index'))
+        other_client = Client()
+        other_client.force_login(TaskPagesTests.user3)
+        response = other_client.get(reverse('posts:follow_index'))
+        self.assertNotContains(response, 'Тестовый текст2')
+
     def test_404_custom_template(self):
         """404 использует кастомный шаблон"""
         response = self.authorized_client.get('/test404/')
@@ -0,0 +1,156 @@
+"""
+Заблаговременная генерация миниатюр картинок постов.
+
+sorl-thumbnail создает миниатюру лениво, прямо во время рендера
+шаблона. Здесь миниатюры всех размеров из POST_THUMBNAILS строятся
+в фоновом пуле потоков сразу после сохранения поста, а шаблоны
+только ищут готовую миниатюру и до ее появления показывают заглушку.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.models import KVStore
+
+from .caching import bump_post_cards
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def thumbnail_options(source, alias):
+    """Геометрия и полный набор опций так, как их дополнит sorl."""
+    geometry, options = settings.POST_THUMBNAILS[alias]
+    options = dict(options)
+    backend = default.backend
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return geometry, options
+
+
+def thumbnail_file(image, alias):
+    """Файл миниатюры (возможно, еще не созданной) для картинки."""
+    source = ImageFile(image)
+    geometry, options = thumbnail_options(source, alias)
+    name = default.backend._get_thumbnail_filename(source, geometry, options)
+    return ImageFile(name, default.storage)
+
+
+def lookup(image, alias):
+    """Готовая миниатюра или None; сама миниатюра не создается."""
+    if not image:
+        return None
+    return default.kvstore.get(thumbnail_file(image, alias))
+
+
+def _fetch_raw(keys):
+    """
+    Значения хранилища sorl по ключам: одно чтение кэша, промахи -
+    одним запросом к таблице KVStore. Как и sorl, кэширует отсутствие.
+    """
+    kvstore = default.kvstore
+    values = kvstore.cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        found = dict(KVStore.objects.filter(
+            key__in=missing).values_list('key', 'value'))
+        fetched = {key: found.get(key, cached_db_kvstore.EMPTY_VALUE)
+                   for key in missing}
+        kvstore.cache.set_many(fetched, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(fetched)
+    return {key: value for key, value in values.items()
+            if value != cached_db_kvstore.EMPTY_VALUE}
+
+
+def prefetch(posts):
+    """
+    Готовые миниатюры всех размеров для постов страницы разом.
+    Каждому посту ставится словарь post.thumbnails {размер: миниатюра}.
+    """
+    posts = [post for post in posts if post.image]
+    if not posts:
+        return
+    if not isinstance(default.kvstore, cached_db_kvstore.KVStore):
+        for post in posts:
+            post.thumbnails = {alias: lookup(post.image, alias)
+                               for alias in settings.POST_THUMBNAILS}
+        return
+    keys = {
+        (post.pk, alias): add_prefix(thumbnail_file(post.image, alias).key)
+        for post in posts for alias in settings.POST_THUMBNAILS
+    }
+    values = _fetch_raw(list(set(keys.values())))
+    for post in posts:
+        post.thumbnails = {}
+        for alias in settings.POST_THUMBNAILS:
+            value = values.get(keys[post.pk, alias])
+            post.thumbnails[alias] = (
+                deserialize_image_file(value) if value else None)
+
+
+def generate(name):
+    """Строит миниатюры всех размеров для файла картинки."""
+    try:
+        for alias in settings.POST_THUMBNAILS:
+            geometry, options = settings.POST_THUMBNAILS[alias]
+            default.backend.get_thumbnail(name, geometry, **options)
+        # Карточки и ленты с заглушкой пора перерисовать
+        bump_post_cards(image=name)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', name)
+    finally:
+        with _lock:
+            _pending.discard(name)
+
+
+def _work(name):
+    try:
+        generate(name)
+    finally:
+        # У потока пула свое соединение с БД
+        connection.close()
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+        return _executor
+
+
+def enqueue(name):
+    """
+    Ставит картинку в очередь. Один файл не обрабатывается
+    дважды одновременно, поэтому воркеры не гоняются за ним.
+    """
+    if not name:
+        return
+    with _lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+    if not settings.THUMBNAIL_WORKERS:
+        generate(name)
+        return
+    _get_executor().submit(_work, name)
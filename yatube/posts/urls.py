@@ -8,6 +8,7 @@ app_name = 'posts'
 urlpatterns = [
     path('', views.index, name='index'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
+    path('search/', views.search, name='search'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
@@ -15,6 +16,7 @@ urlpatterns = [
     path(
         'posts/<int:post_id>/comment/', views.add_comment, name='add_comment'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('fragments/', views.fragments, name='fragments'),
     path(
         'profile/<str:username>/follow/', views.profile_follow,
         name='profile_follow'),
@@ -22,3 +24,18 @@ urlpatterns = [
         'profile/<str:username>/unfollow/', views.profile_unfollow,
         name='profile_unfollow'),
 ]
+
+# Сколько SQL-запросов может сделать страница при пустом кэше.
+# Бюджеты проверяет posts/tests/test_query_budgets.py: если страница
+# стала делать больше запросов, поднимите бюджет осознанно.
+query_budgets = {
+    'index': 4,
+    'group_list': 5,
+    'search': 4,
+    'profile': 6,
+    'post_detail': 5,  # автор поста для ETag, пока его нет в кэше
+    'post_create': 3,
+    'post_edit': 5,
+    'follow_index': 4,
+    'fragments': 4,
+}
@@ -1,9 +1,190 @@
+import binascii
+import collections.abc
+
 from django.conf import settings
 from django.core.paginator import Paginator
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_bytes, force_str
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
 
 
 def make_pagination(object, request):
-    """Функция для создания постраничной пагинации"""
+    """
+    Функция для создания постраничной пагинации.
+    Курсор применим только к QuerySet; остальные
+    последовательности листаются по номерам страниц.
+    """
+    if settings.CURSOR_PAGINATION and isinstance(object, QuerySet):
+        return make_cursor_pagination(object, request)
     paginator = Paginator(object, settings.POSTS_AMOUNT)
     page_number = request.GET.get('page')
     return paginator.get_page(page_number)
+
+
+def make_cursor_pagination(object, request):
+    """Пагинация по курсору (?after=/?before=) без COUNT(*) и OFFSET"""
+    paginator = CursorPaginator(object, settings.POSTS_AMOUNT)
+    return paginator.get_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+
+
+def make_lazy_pagination(object, request):
+    """
+    make_pagination для страниц, которые обычно целиком берутся из
+    кэша фрагментов: база читается, только когда страницу выводят.
+    """
+    if settings.CURSOR_PAGINATION and isinstance(object, QuerySet):
+        return SimpleLazyObject(
+            lambda: make_cursor_pagination(object, request))
+    paginator = LazyPaginator(object, settings.POSTS_AMOUNT)
+    return paginator.get_page(request.GET.get('page'))
+
+
+class LazyPaginator(Paginator):
+    """
+    Paginator, отдающий обычный Page без обращения к базе: первая
+    страница существует всегда и не требует COUNT(*), а записи
+    страницы читаются при первом обходе. orphans не поддерживается.
+    """
+
+    def validate_number(self, number):
+        if self.allow_empty_first_page and number in (1, '1'):
+            return 1
+        return super().validate_number(number)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+
+        def object_list():
+            items = list(self.object_list[bottom:top])
+            if len(items) < self.per_page:
+                # Неполная страница - последняя, COUNT(*) уже не нужен
+                self.__dict__.setdefault('count', bottom + len(items))
+            return items
+
+        return self._get_page(SimpleLazyObject(object_list), number, self)
+
+
+def encode_cursor(obj, date_field='pub_date'):
+    """Непрозрачный токен позиции в ленте: (дата, id)."""
+    raw = f'{getattr(obj, date_field).isoformat()}|{obj.pk}'
+    return urlsafe_base64_encode(force_bytes(raw))
+
+
+def decode_cursor(token):
+    """Разбирает токен; для битого или чужого токена возвращает None."""
+    if not token:
+        return None
+    try:
+        pub_date, pk = force_str(urlsafe_base64_decode(token)).split('|')
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (ValueError, TypeError, UnicodeDecodeError, binascii.Error):
+        return None
+    if pub_date is None:
+        return None
+    return pub_date, pk
+
+
+class CursorPage(collections.abc.Sequence):
+    """Страница ленты при пагинации по курсору"""
+    is_cursor = True
+    # Прочие GET-параметры страницы (например, q=...&) для ссылок
+    query_prefix = ''
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage {self.previous_cursor}:{self.next_cursor}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    Keyset-пагинация по (date_field, id), новые записи первыми.
+    Любая страница читается одним запросом с LIMIT по индексу,
+    поэтому время не зависит от глубины.
+
+    Если QuerySet уже явно отсортирован по двум полям по убыванию
+    (например, лента подписок - по аннотациям с колонками своего
+    индекса), курсор сравнивает и сортирует именно их. Значения этих
+    полей должны совпадать с date_field и id объекта, из которых
+    строится курсор.
+    """
+
+    def __init__(self, object_list, per_page, date_field='pub_date'):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.date_field = date_field
+        ordering = object_list.query.order_by
+        if len(ordering) == 2 and all(
+                isinstance(field, str) and field.startswith('-')
+                for field in ordering):
+            self.date_key, self.pk_key = (field[1:] for field in ordering)
+        else:
+            self.date_key, self.pk_key = date_field, 'pk'
+
+    def _after(self, date, pk, direction):
+        # direction: 'lt' - записи старше курсора, 'gt' - новее
+        return (Q(**{f'{self.date_key}__{direction}': date})
+                | Q(**{self.date_key: date,
+                       f'{self.pk_key}__{direction}': pk}))
+
+    def get_page(self, after=None, before=None):
+        after = decode_cursor(after)
+        before = decode_cursor(before) if after is None else None
+        if before is not None:
+            return self._page_before(*before)
+        queryset = self.object_list.order_by(
+            f'-{self.date_key}', f'-{self.pk_key}')
+        if after is not None:
+            queryset = queryset.filter(self._after(*after, 'lt'))
+        items = list(queryset[:self.per_page + 1])
+        has_next = len(items) > self.per_page
+        items = items[:self.per_page]
+        return self._make_page(
+            items, has_next=has_next, has_previous=after is not None)
+
+    def _page_before(self, date, pk):
+        queryset = self.object_list.order_by(
+            self.date_key, self.pk_key).filter(
+            self._after(date, pk, 'gt'))
+        items = list(queryset[:self.per_page + 1])
+        has_previous = len(items) > self.per_page
+        items = items[:self.per_page][::-1]
+        return self._make_page(
+            items, has_next=True, has_previous=has_previous)
+
+    def _make_page(self, items, has_next, has_previous):
+        def cursor(obj):
+            return encode_cursor(obj, self.date_field)
+
+        return CursorPage(
+            items,
+            next_cursor=cursor(items[-1]) if has_next and items else None,
+            previous_cursor=(
+                cursor(items[0]) if has_previous and items else None),
+        )
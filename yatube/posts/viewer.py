@@ -0,0 +1,44 @@
+"""
+Флаги отношения читателя к авторам: подписан ли он, не сам ли это он.
+
+Флаги добавляются аннотациями к QuerySet, поэтому на страницу
+приходится один EXISTS-подзапрос внутри основного запроса, а не
+запрос на каждую карточку. Для анонима флаги - константа False.
+"""
+from django.db.models import BooleanField, Case, Exists, OuterRef, Value, When
+
+from .models import Follow
+
+FALSE = Value(False, output_field=BooleanField())
+
+
+def followed_by(viewer, author_ref='pk'):
+    """Подзапрос: читатель подписан на автора из поля author_ref."""
+    if not viewer.is_authenticated:
+        return FALSE
+    return Exists(Follow.objects.filter(
+        user_id=viewer.pk, author_id=OuterRef(author_ref)))
+
+
+def is_viewer(viewer, author_ref='pk'):
+    """Условие: автор из поля author_ref - сам читатель."""
+    if not viewer.is_authenticated:
+        return FALSE
+    return Case(When(**{author_ref: viewer.pk}, then=True),
+                default=False, output_field=BooleanField())
+
+
+def authors(viewer, queryset):
+    """Пользователи с is_followed_by_viewer и is_viewer."""
+    return queryset.annotate(
+        is_followed_by_viewer=followed_by(viewer),
+        is_viewer=is_viewer(viewer),
+    )
+
+
+def posts(viewer, queryset):
+    """Посты с флагами автора author_is_followed и author_is_viewer."""
+    return queryset.annotate(
+        author_is_followed=followed_by(viewer, 'author_id'),
+        author_is_viewer=is_viewer(viewer, 'author_id'),
+    )
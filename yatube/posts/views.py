@@ -1,15 +1,32 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
-
+from django.utils.functional import SimpleLazyObject
+from django.views.decorators.cache import never_cache
+
+from core import pagecache, replicas
+from core.sqlite import write_transaction
+
+from . import fragments as page_fragments
+from . import viewer
+from .caching import (ALL_PAGES, AUTHOR_PAGES, GROUP_PAGES, INDEX_PAGES,
+                      POST_PAGES, celebrity_authors, follow_generation,
+                      index_generation, thread_generation, viewer_generation)
+from .conditional import (changed_at, conditional, feed_keys, post_keys,
+                          profile_keys)
+from .feed import follow_feed
 from .forms import CommentForm, PostForm
-from .models import Comment, Follow, Group, Post
-from .utils import make_pagination
+from .models import Follow, Group, Post
+from .search import search_posts
+from .utils import CursorPaginator, make_lazy_pagination, make_pagination
 
 User = get_user_model()
 
 
+@conditional(feed_keys)
+@replicas.replica_reads(changed_at)
 def index(request):
     """
     Рендер главной страницы.
@@ -17,54 +34,100 @@ def index(request):
     где необходима пагинация -
     она реализована внутри контекста.)
     """
-    post_list = Post.objects.select_related('author', 'group').all()
+    post_list = viewer.posts(
+        request.user, Post.objects.select_related('author', 'group'))
+    # Лента читается, только если фрагмента нет в кэше: пока БД
+    # недоступна, страница собирается из прежней копии
+    page_obj = SimpleLazyObject(lambda: make_pagination(post_list, request))
     context = {
-        'page_obj': make_pagination(post_list, request),
+        'page_obj': page_obj,
         'is_not_profile': True,
+        'cache_generation': index_generation(),
+        'viewer_generation': viewer_generation(request.user),
+        'cache_timeout': settings.FEED_CACHE_TIMEOUT,
     }
-    return render(request, 'posts/index.html', context)
+    response = render(request, 'posts/index.html', context)
+    return pagecache.tag(response, ALL_PAGES, INDEX_PAGES)
 
 
+@conditional(feed_keys)
+@replicas.replica_reads(changed_at)
 def group_posts(request, slug):
     """Рендер страницы постов по группам"""
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.select_related('author').all()
+    posts = viewer.posts(request.user, group.posts.select_related('author'))
     context = {
         'group': group,
         'page_obj': make_pagination(posts, request),
         'is_not_profile': True,
     }
-    return render(request, 'posts/group_list.html', context)
+    response = render(request, 'posts/group_list.html', context)
+    return pagecache.tag(response, ALL_PAGES, GROUP_PAGES.format(group.pk))
+
+
+def search(request):
+    """Поиск по тексту постов"""
+    query = request.GET.get('q', '').strip()
+    context = {
+        'query': query,
+        'page_obj': search_posts(
+            query,
+            settings.POSTS_AMOUNT,
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+        ),
+        'is_not_profile': True,
+    }
+    return render(request, 'posts/search.html', context)
 
 
+@conditional(profile_keys)
+@replicas.replica_reads(changed_at)
 def profile(request, username):
     """Профаил"""
-    author = get_object_or_404(User, username=username)
-    try:
-        following = Follow.objects.get(author=author)
-    except Follow.DoesNotExist:
-        following = None
+    author = get_object_or_404(
+        viewer.authors(request.user, User.objects.select_related('counters')),
+        username=username)
     context = {
         'author': author,
         'page_obj': make_pagination(author.posts.
                                     select_related('group').all(), request),
-        'following': following,
+        'following': author.is_followed_by_viewer,
     }
-    return render(request, 'posts/profile.html', context)
+    response = render(request, 'posts/profile.html', context)
+    return pagecache.tag(
+        response, ALL_PAGES, AUTHOR_PAGES.format(author.pk))
 
 
+@conditional(post_keys)
+@replicas.replica_reads(changed_at)
 def post_detail(request, post_id):
     """Отдельный пост"""
-    post = Post.objects.select_related('author', 'group').get(pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__counters', 'group'),
+        pk=post_id)
     comment_form = CommentForm()
-    comments = Comment.objects.filter(post=post_id)
+    # Комментарии читаются, только если ветки нет в кэше шаблона
+    comments = SimpleLazyObject(lambda: CursorPaginator(
+        post.comments.select_related('author'),
+        settings.COMMENTS_AMOUNT,
+        date_field='created',
+    ).get_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    ))
     context = {
         'post': post,
         'title': f'Пост {post.text[:settings.SYMBOLS_AMOUNT]}',
         'form': comment_form,
-        'comments': comments
+        'comments': comments,
+        'thread_generation': thread_generation(post.pk),
+        'cache_timeout': settings.FEED_CACHE_TIMEOUT,
     }
-    return render(request, 'posts/post_detail.html', context)
+    response = render(request, 'posts/post_detail.html', context)
+    # Рядом с постом выводится счетчик постов автора
+    return pagecache.tag(response, ALL_PAGES, POST_PAGES.format(post.pk),
+                         AUTHOR_PAGES.format(post.author_id))
 
 
 @login_required
@@ -76,7 +139,8 @@ def post_create(request):
         if form.is_valid():
             post = form.save(commit=False)
             post.author = request.user
-            post.save()
+            write_transaction(post.save)
+            replicas.pin(request)
             return redirect('posts:profile', username=post.author)
         return render(request, 'posts/create_post.html', {'form': form})
     form = PostForm()
@@ -95,7 +159,8 @@ def post_edit(request, post_id):
             files=request.FILES or None,
             instance=post)
         if form.is_valid():
-            form.save()
+            write_transaction(form.save)
+            replicas.pin(request)
             return redirect('posts:post_detail', post_id=post.id)
         return render(request, 'posts/create_post.html',
                       {'form': form})
@@ -107,22 +172,38 @@ def post_edit(request, post_id):
 @login_required
 def add_comment(request, post_id):
     """Добавление комментария"""
-    post = Post.objects.get(pk=post_id)
+    post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        write_transaction(comment.save)
+        replicas.pin(request)
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@never_cache
+def fragments(request):
+    """
+    Персональные части страницы из кэша для сборки на клиенте или
+    через ESI: /fragments/?hole=header&hole=follow:5
+    """
+    holes = request.GET.getlist('hole')[:settings.POSTS_AMOUNT * 2]
+    return JsonResponse(page_fragments.render(request, holes))
+
+
 @login_required
 def follow_index(request):
     """Список постов по подписке"""
-    posts = Post.objects.filter(author__following__user=request.user)
+    celebrity_ids = celebrity_authors(request.user)
+    posts = follow_feed(request.user, celebrity_ids,
+                        viewer.posts(request.user, Post.objects.all()))
+    # Как на главной: лента читается, только если фрагмента нет в кэше
     context = {
-        'page_obj': make_pagination(posts, request)
+        'page_obj': make_lazy_pagination(posts, request),
+        'cache_generation': follow_generation(request.user, celebrity_ids),
+        'cache_timeout': settings.FEED_CACHE_TIMEOUT,
     }
     return render(request, 'posts/follow.html', context)
 
@@ -132,8 +213,9 @@ def profile_follow(request, username):
     """Подписаться на автора"""
     following = get_object_or_404(User, username=username)
     if following != request.user:
-        Follow.objects.get_or_create(user=request.user,
-                                     author=following)
+        write_transaction(Follow.objects.get_or_create,
+                          user=request.user, author=following)
+        replicas.pin(request)
     return redirect('posts:profile', username=username)
 
 
@@ -141,5 +223,7 @@ def profile_follow(request, username):
 def profile_unfollow(request, username):
     """Отписка от автора"""
     following = get_object_or_404(User, username=username)
-    Follow.objects.get(user=request.user, author=following).delete()
+    write_transaction(
+        Follow.objects.filter(user=request.user, author=following).delete)
+    replicas.pin(request)
     return redirect('posts:profile', username=username)
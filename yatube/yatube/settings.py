@@ -11,13 +11,83 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import sys
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
+# Запуск под manage.py test или pytest
+TESTING = 'test' in sys.argv or 'pytest' in sys.modules
+
 SYMBOLS_AMOUNT = 15
 POSTS_AMOUNT = 10
+COMMENTS_AMOUNT = 20
 EXTRA_POSTS = 2
+# Пагинация по курсору (?after=/?before=) вместо номеров страниц
+CURSOR_PAGINATION = False
+# Размер пачки при записи в материализованные ленты подписок
+TIMELINE_BATCH_SIZE = 1000
+# Авторы с таким числом подписчиков не раскладываются по лентам,
+# их посты подмешиваются при чтении из списка последних публикаций
+FEED_CELEBRITY_THRESHOLD = 10000
+FEED_RECENT_POSTS = 500
+# Сколько хранится в кэше отрисованная карточка поста
+POST_CARD_TIMEOUT = 60 * 60 * 24
+# TTL фрагментов лент: ключи версионируются поколениями (posts.caching)
+FEED_CACHE_TIMEOUT = 60 * 60 * 6
+# Защита лент от одновременного пересчета (core.stampede): сколько
+# живет блокировка пересчета, сколько ждать чужой пересчет и сколько
+# после истечения можно отдавать прежнюю копию
+CACHE_LOCK_TIMEOUT = 30
+CACHE_LOCK_WAIT = 2
+CACHE_STALE_TIMEOUT = 60 * 10
+# Страницы для анонимов целиком (core.pagecache); сбрасываются
+# по суррогатным ключам, TTL лишь ограничивает объем кэша
+PAGE_CACHE_TIMEOUT = 60 * 60
+# Вошедшим читателям отдаются те же страницы, а персональные части
+# ({% hole %}) рендерит эта функция
+PAGE_CACHE_HOLES = 'posts.fragments.render'
+# Поколение читателя для ETag таких страниц: меняется вместе с его дырами
+PAGE_CACHE_VIEWER = 'posts.caching.viewer_generation'
+# Размеры миниатюр из шаблонов: строятся заранее в фоновом пуле потоков
+# (0 потоков - синхронно после коммита)
+POST_THUMBNAILS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+# В тестах синхронно: фоновый поток не должен писать в уже
+# удаленный временный MEDIA_ROOT
+THUMBNAIL_WORKERS = 0 if TESTING else 2
+
+# PRAGMA для каждого соединения SQLite (core.sqlite): WAL не дает
+# записи блокировать читателей, NORMAL в WAL не теряет целостность,
+# mmap и кэш страниц (в КиБ со знаком минус) на соединение, ожидание
+# занятой базы в мс вместо мгновенной ошибки
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'busy_timeout': 5000,
+}
+# Повторы коротких транзакций записи при «database is locked»
+# и пауза перед первым повтором в секундах (дальше вдвое больше)
+SQLITE_WRITE_RETRIES = 3
+SQLITE_RETRY_DELAY = 0.05
+# Реплики для чтения лент и страниц постов (core.replicas): копии
+# основной базы, которые обновляет manage.py sync_replicas. Число
+# реплик задается YATUBE_REPLICAS; в тестах реплик нет
+REPLICAS = [
+    f'replica{number}' for number in range(
+        1, 1 + (0 if TESTING else int(os.environ.get('YATUBE_REPLICAS', 0))))
+]
+# С реплик читаются только модели этих приложений
+REPLICA_APPS = ['posts']
+# Сколько секунд после записи сессия читает из основной базы
+REPLICA_PIN_SECONDS = 5
+# Насколько копия должна быть моложе метки поколения страницы, чтобы
+# в ней точно была транзакция, поставившая метку до своего коммита
+REPLICA_SNAPSHOT_MARGIN = 1
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
@@ -59,36 +129,67 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'sorl.thumbnail',
-    'debug_toolbar',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.PageCacheMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'core.middleware.PageShellMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+# debug_toolbar только по явному запросу: под нагрузкой он бесполезен
+# и сильно замедляет каждый ответ. Включается DEBUG_TOOLBAR=1
+DEBUG_TOOLBAR = DEBUG and os.environ.get('DEBUG_TOOLBAR') == '1'
+if DEBUG_TOOLBAR:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
+# Заголовок Server-Timing с временем SQL, шаблонов и числом
+# обращений к кэшу; /metrics доступен с этих адресов и персоналу
+SERVER_TIMING = True
+METRICS_ALLOWED_IPS = ['127.0.0.1']
+# Сколько раз один и тот же по форме SQL может повториться за запрос,
+# прежде чем это сочтут N+1; в тестах повтор поднимает исключение
+QUERY_REPEAT_LIMIT = 5
+QUERY_REPEAT_RAISE = TESTING
+
 INTERNAL_IPS = [
     '127.0.0.1',
 ] 
 
+# Двухуровневый кэш: LRU в памяти каждого воркера перед общим
+# файловым кэшем; воркеры сообщают друг другу об изменениях через
+# журнал в том же каталоге. Тесты берут кэш в памяти процесса, чтобы
+# не встретить записи, оставшиеся от прошлой тестовой базы
+CACHE_DIR = os.environ.get(
+    'YATUBE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'yatube-cache'))
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.TwoTierCache',
+        'LOCATION': CACHE_DIR,
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'L1_MAX_ENTRIES': 1000,
+            'L1_TIMEOUT': 30,
+        },
     }
 }
+if TESTING:
+    CACHES['default'] = {'BACKEND': 'core.cache.LocMemCache'}
 
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backend.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -111,10 +212,20 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        # sqlite3 Django, но пишущие транзакции открываются BEGIN IMMEDIATE
+        'ENGINE': 'core.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Соединение живет между запросами: PRAGMA и прогретые
+        # mmap и кэш страниц не теряются на каждом запросе
+        'CONN_MAX_AGE': 60,
     }
 }
+for alias in REPLICAS:
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': os.path.join(BASE_DIR, f'db.{alias}.sqlite3'),
+    }
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
 
 
 # Password validation
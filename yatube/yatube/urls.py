@@ -18,20 +18,25 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from core.views import metrics
+
 urlpatterns = [
     path('', include('posts.urls', namespace='posts')),
     path('admin/', admin.site.urls),
     path('auth/', include('users.urls')),
     path('about/', include('about.urls', namespace='about')),
+    path('metrics', metrics, name='metrics'),
     # path('auth/', include('django.contrib.auth.urls')),
 ]
 
 if settings.DEBUG:
-    import debug_toolbar
-
     urlpatterns += static(
         settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
     )
+
+if settings.DEBUG_TOOLBAR:
+    import debug_toolbar
+
     urlpatterns += (path('__debug__/', include(debug_toolbar.urls)),)
 
 handler404 = 'core.views.page_not_found'